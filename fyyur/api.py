@@ -0,0 +1,75 @@
+"""The JSON API, under /api/v1."""
+from flask import Blueprint, request, redirect, url_for
+
+from models import db, get_venue_areas, get_artist_page, get_show_page, get_entity_state, get_listing_state, query_catalog, venues_near, Venue
+from search import search
+from jsonapi import make_etag, is_fresh, not_modified, json_response
+from views import CATALOG_MODELS, BROWSE_LIMIT, SHOWS_PER_PAGE, ARTISTS_PER_PAGE, catalog_filters, cached_genre_facets
+from views import show_page_args, encode_show_cursor, artist_page_args
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def api_not_found():
+  return json_response({'error': 'not found'}, status=404)
+
+@bp.route('/<any(venues, artists):kind>')
+def api_listing(kind):
+  # artists: ?letter= [&after=], in keyset pages by name as on /artists
+  model = CATALOG_MODELS[kind]
+  # answered from the table's write count before anything is read
+  etag = make_etag(kind, request.args.get('letter'), request.args.get('after'), get_listing_state(model))
+  if is_fresh(etag):
+    return not_modified(etag)
+  if model is Venue:
+    return json_response({'data': get_venue_areas()}, etag)
+  letters, letter, after = artist_page_args()
+  data, next_name = get_artist_page(letter, after=after, limit=ARTISTS_PER_PAGE)
+  return json_response({'letter': letter, 'letters': letters, 'data': data, 'next': next_name}, etag)
+
+@bp.route('/<any(venues, artists):kind>/<int:entity_id>')
+def api_detail(kind, entity_id):
+  model = CATALOG_MODELS[kind]
+  state = get_entity_state(model, entity_id)
+  if state is None:
+    return api_not_found()
+  etag = make_etag(kind, entity_id, state)
+  if is_fresh(etag):
+    return not_modified(etag)
+  return json_response({'data': db.session.get(model, entity_id).get_data_dict()}, etag)
+
+@bp.route('/<any(venues, artists):kind>/search')
+def api_search(kind):
+  if not request.args.get('q', '').strip():
+    return redirect(url_for('.api_listing', kind=kind))
+  return json_response(search(CATALOG_MODELS[kind], request.args.get('q')))
+
+@bp.route('/<any(venues, artists):kind>/genres')
+def api_genre_facets(kind):
+  model = CATALOG_MODELS[kind]
+  filters = catalog_filters()
+  return json_response({
+    'facets': [{'genre': genre, 'count': count} for genre, count in cached_genre_facets(model, filters)],
+    'data': [dict(row._mapping) for row in query_catalog(model, **filters).limit(BROWSE_LIMIT)],
+  })
+
+@bp.route('/venues/near')
+def api_venues_near():
+  # ?lat=&lng= [&k=10] [&radius=km]
+  latitude = request.args.get('lat', type=float)
+  longitude = request.args.get('lng', type=float)
+  k = request.args.get('k', 10, type=int)
+  radius = request.args.get('radius', type=float)
+  if (latitude is None or longitude is None or not -90 <= latitude <= 90
+      or not -180 <= longitude <= 180 or not 0 < k <= 100 or (radius is not None and radius <= 0)):
+    return json_response({'error': 'lat and lng are required; k is 1-100, radius positive'}, status=400)
+  return json_response({'data': venues_near(latitude, longitude, k, radius)})
+
+@bp.route('/shows')
+def api_shows():
+  after, filters = show_page_args()
+  data, next_key = get_show_page(after=after, limit=SHOWS_PER_PAGE, **filters)
+  return json_response({
+    'data': data,
+    'next': encode_show_cursor(next_key) if next_key else None,
+  })
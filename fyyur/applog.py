@@ -0,0 +1,130 @@
+"""Structured, non-blocking logging for fyyur.
+
+Loggers only put records on a queue; a background thread formats them
+as one JSON object per line and writes them out, so a slow disk or
+terminal never holds up a request. Records made during a request carry
+its id, which is also sent back in the ``X-Request-Id`` header.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+# attributes every LogRecord has; anything else was passed in ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'request_id', 'taskName'}
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """Lets through only ``rate`` of the records below INFO."""
+
+    def __init__(self, rate):
+        super(SampleFilter, self).__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.INFO or random.random() < self.rate
+
+
+class BackgroundQueueHandler(QueueHandler):
+
+    def prepare(self, record):
+        # only what cannot wait for the writer thread: the message
+        # arguments and the traceback may not outlive the request
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# the listener the fyyur loggers feed; the loggers are shared by every
+# app of the process, so a new app's listener replaces the last one
+_listener = None
+
+
+def route_logs(app):
+    """Route ``app.logger`` and the ``fyyur.*`` loggers through a new
+    queue and listener, stopping the previous listener."""
+    global _listener
+    if _listener is not None:
+        atexit.unregister(_listener.stop)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    formatter = JSONFormatter()
+    handlers = [logging.StreamHandler()]
+    if not app.debug:
+        handlers.append(logging.FileHandler(app.config['LOG_FILE']))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    records = queue.Queue(-1)
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    queue_handler = BackgroundQueueHandler(records)
+    queue_handler.addFilter(RequestIdFilter())
+    for logger in (app.logger, logging.getLogger('fyyur')):
+        logger.handlers[:] = [queue_handler]
+        logger.setLevel(app.config['LOG_LEVEL'])
+        logger.propagate = False
+    for name, rate in app.config['LOG_SAMPLING'].items():
+        logger = logging.getLogger(name)
+        for sample in [f for f in logger.filters if isinstance(f, SampleFilter)]:
+            logger.removeFilter(sample)
+        logger.addFilter(SampleFilter(rate))
+    return _listener
+
+
+def setup_logging(app):
+    """Route the app's logs through the queue and tag requests with an id."""
+    listener = route_logs(app)
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get('X-Request-Id') or uuid.uuid4().hex
+
+    @app.after_request
+    def send_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-Id'] = g.request_id
+        return response
+
+    return listener
@@ -0,0 +1,158 @@
+"""Fingerprinted, precompressed static files.
+
+``build_assets()`` copies the static folder to ``ASSETS_BUILD_DIR`` with
+a content hash in every file name, rewrites the ``url()`` references in
+stylesheets to the hashed names, and writes gzip (and, when the brotli
+package is installed, brotli) variants next to the files that shrink.
+A ``manifest.json`` maps each original path to its hashed one.
+
+``Assets`` serves that directory under ``/assets``: the variant is
+picked from the request's Accept-Encoding, and since a hashed name
+never changes content those responses may be cached for a year without
+revalidation. The manifest and any file without a hash in its name are
+served ``no-cache``, so they are revalidated on every use. Templates link files through ``static_url()``, which
+falls back to the plain static folder until the assets are built.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+ONE_YEAR = 365 * 24 * 3600
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.ttf', '.otf', '.eot', '.json', '.txt', '.html')
+# a variant is only kept when it saves at least this much
+MIN_SAVING = 0.1
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+# the file part of a url and its ?query / #fragment
+_URL_PARTS = re.compile(r'([^?#]*)(.*)')
+
+
+def hashed_name(path, content):
+    root, ext = posixpath.splitext(path)
+    return '{}.{}{}'.format(root, hashlib.sha1(content).hexdigest()[:HASH_LENGTH], ext)
+
+
+def rewrite_css_urls(path, content, manifest):
+    # url(../fonts/x.woff?v=1) -> url(../fonts/x.<hash>.woff?v=1)
+    directory = posixpath.dirname(path)
+
+    def replace(match):
+        quote, url = match.groups()
+        target, rest = _URL_PARTS.match(url).groups()
+        resolved = posixpath.normpath(posixpath.join(directory, target))
+        if ':' in target or target.startswith('/') or resolved not in manifest:
+            return match.group(0)
+        target = posixpath.join(posixpath.dirname(target), posixpath.basename(manifest[resolved]))
+        return 'url({0}{1}{2}{0})'.format(quote, target, rest)
+
+    return _CSS_URL.sub(replace, content.decode()).encode()
+
+
+def write_variants(path, content):
+    # path.gz / path.br beside the file, for the types worth compressing
+    if not path.endswith(COMPRESSIBLE):
+        return
+    variants = [('.gz', gzip.compress(content, 9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content)))
+    for suffix, compressed in variants:
+        if len(compressed) <= len(content) * (1 - MIN_SAVING):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+
+
+def build_assets(source, target):
+    """Build ``source`` into ``target`` and return the manifest.
+
+    Stylesheets are hashed after their references are rewritten, so a
+    changed font also changes the name of the CSS that uses it.
+    """
+    files = []
+    for directory, _, names in os.walk(source):
+        for name in names:
+            files.append(posixpath.relpath(os.path.join(directory, name), source).replace(os.sep, '/'))
+    # everything a stylesheet can refer to first
+    files.sort(key=lambda path: (path.endswith('.css'), path))
+
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    manifest = {}
+    for path in files:
+        with open(os.path.join(source, path), 'rb') as f:
+            content = f.read()
+        if path.endswith('.css'):
+            content = rewrite_css_urls(path, content, manifest)
+        manifest[path] = hashed_name(path, content)
+        output = os.path.join(target, manifest[path])
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'wb') as f:
+            f.write(content)
+        write_variants(output, content)
+    with open(os.path.join(target, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class Assets(object):
+    """Serves the built assets and gives templates ``static_url()``."""
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.manifest = {}
+        self.hashed = frozenset()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.send)
+        app.jinja_env.globals['static_url'] = self.static_url
+        self.load(app.config['ASSETS_BUILD_DIR'])
+
+    def load(self, directory):
+        self.directory = directory
+        try:
+            with open(os.path.join(directory, MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {}
+        self.hashed = frozenset(self.manifest.values())
+
+    def static_url(self, path):
+        hashed = self.manifest.get(path)
+        if hashed is None:
+            return url_for('static', filename=path)
+        return url_for('assets', filename=hashed)
+
+    def send(self, filename):
+        immutable = filename in self.hashed
+        max_age = ONE_YEAR if immutable else None
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encodings = request.accept_encodings
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encodings[encoding] and os.path.isfile(os.path.join(self.directory, filename + suffix)):
+                response = send_from_directory(self.directory, filename + suffix, mimetype=mimetype,
+                                               max_age=max_age)
+                response.content_encoding = encoding
+                break
+        else:
+            response = send_from_directory(self.directory, filename, mimetype=mimetype, max_age=max_age)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        if immutable:
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
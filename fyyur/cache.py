@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class FragmentCache(object):
+    """Size-bounded LRU cache for rendered page fragments.
+
+    Entries are stored per key together with the version of the entity
+    they were rendered from; a lookup with any other version is a miss,
+    so a bumped version retires the old entry everywhere without an
+    explicit invalidation. Every entry also has a deadline after which
+    it is dropped.
+    """
+
+    def __init__(self, max_entries=1000, max_size=64 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, prefix):
+        # sized from the app's ``<prefix>_MAX_ENTRIES``, ``_MAX_SIZE`` and ``_TTL``
+        self.max_entries = app.config.get(prefix + '_MAX_ENTRIES', self.max_entries)
+        self.max_size = app.config.get(prefix + '_MAX_SIZE', self.max_size)
+        self.ttl = app.config.get(prefix + '_TTL', self.ttl)
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or entry[2] <= time.time():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, version, value, expires_at=None):
+        # ``expires_at`` (a timestamp) can only shorten the default ttl
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        size = len(value)
+        if size > self.max_size:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (version, value, deadline, size)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[3]
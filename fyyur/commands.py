@@ -0,0 +1,108 @@
+"""Maintenance commands, added to the ``flask`` command line.
+
+The bulk loaders are imported when their command runs, so the web
+workers never load them.
+"""
+import time
+
+import click
+from flask import Blueprint, current_app
+from sqlalchemy import Float, String, column, select, true, values
+
+from models import db, catalog_generation, rollover_shows, recount_shows, partition_shows, lift_statement_timeout, Venue, Artist, Show
+from models import PARTITION_MONTHS_AHEAD, ARCHIVE_AFTER_MONTHS
+from geocode import geocode
+
+bp = Blueprint('commands', __name__, cli_group=None)
+
+
+@bp.cli.command('rollover-shows')
+def rollover_shows_command():
+  """Move shows that have started from the upcoming to the past counters.
+  Meant to be run every few minutes from cron."""
+  moved = rollover_shows()
+  print('{} shows rolled over'.format(moved))
+
+@bp.cli.command('recount-shows')
+def recount_shows_command():
+  """Rebuild the upcoming/past show counters from the Show table."""
+  lift_statement_timeout()
+  recount_shows()
+  print('show counters rebuilt')
+
+@bp.cli.command('partition-shows')
+@click.option('--ahead', default=PARTITION_MONTHS_AHEAD, show_default=True, help='months of partitions kept ready after this one')
+@click.option('--archive-after', default=ARCHIVE_AFTER_MONTHS, show_default=True, help='months of past shows kept out of the archive')
+def partition_shows_command(ahead, archive_after):
+  """Create the coming months' Show partitions and archive the old ones.
+  Meant to be run daily from cron, and after a bulk import."""
+  lift_statement_timeout()
+  created, archived = partition_shows(ahead=ahead, archive_after=archive_after)
+  print('{} partitions created, {} archived'.format(len(created), len(archived)))
+
+@bp.cli.command('geocode-venues')
+@click.option('--all', 'everything', is_flag=True, help='also re-place venues that already have coordinates')
+def geocode_venues_command(everything):
+  """Fill in venue coordinates from the geocode table."""
+  # one UPDATE ... FROM (VALUES ...) per batch of cities, so no venue
+  # is loaded into the session
+  from importer import batched
+  venues = Venue.__table__
+  pending = venues.c.latitude.is_(None) if not everything else true()
+  places = [(city, state) + geocode(city, state) for city, state in
+            db.session.execute(select(venues.c.city, venues.c.state).where(pending).distinct())]
+  placed = 0
+  for batch in batched([place for place in places if place[2] is not None], 1000):
+    found = values(column('city', String), column('state', String), column('latitude', Float),
+                   column('longitude', Float), name='place').data(batch)
+    placed += db.session.execute(venues.update().where(
+      venues.c.city == found.c.city, venues.c.state == found.c.state, pending
+    ).values(latitude=found.c.latitude, longitude=found.c.longitude, version=venues.c.version + 1)).rowcount
+    db.session.commit()
+  # the mapper events that move the generation did not run
+  catalog_generation['Venue'] += 1
+  print('{} venues placed'.format(placed))
+
+@bp.cli.command('import-data')
+@click.option('--venues', type=click.Path(exists=True, dir_okay=False), help='CSV or JSONL file of venues')
+@click.option('--artists', type=click.Path(exists=True, dir_okay=False), help='CSV or JSONL file of artists')
+@click.option('--shows', type=click.Path(exists=True, dir_okay=False), help='CSV or JSONL file of shows')
+@click.option('--batch-size', default=5000, show_default=True, help='rows per insert statement')
+def import_data_command(venues, artists, shows, batch_size):
+  """Bulk-load venues, artists and shows, validated like the create forms."""
+  from importer import import_files
+  lift_statement_timeout()
+  for stats in import_files(venues=venues, artists=artists, shows=shows, batch_size=batch_size):
+    print(stats)
+
+@bp.cli.command('generate-data')
+@click.option('--shows', default=100000, show_default=True, help='number of shows, e.g. 10000 to 10000000')
+@click.option('--venues', type=int, help='number of venues  [default: one per 20 shows]')
+@click.option('--artists', type=int, help='number of artists  [default: one per 20 shows]')
+@click.option('--skew', default=1.0, show_default=True, help='Zipf exponent of city, genre, venue and artist popularity')
+@click.option('--seed', default=0, show_default=True, help='the same seed and sizes give the same data')
+@click.option('--batch-size', default=5000, show_default=True, help='rows per insert statement')
+def generate_data_command(shows, venues, artists, skew, seed, batch_size):
+  """Fill an empty database with a synthetic dataset for load tests."""
+  from datagen import Dataset, load_dataset, read_cities
+  lift_statement_timeout()
+  if any(db.session.query(model.id).first() for model in (Venue, Artist, Show)):
+    raise click.ClickException('the database already has data; generate into an empty one')
+  dataset = Dataset(read_cities(current_app.config['GEOCODE_FILE']), shows, venues, artists, skew, seed)
+  started = time.perf_counter()
+  try:
+    load_dataset(dataset, batch_size)
+  except ValueError as e:
+    db.session.rollback()
+    raise click.ClickException(str(e))
+  print('{} venues, {} artists and {} shows generated in {:.1f} s'.format(
+    dataset.venues, dataset.artists, dataset.shows, time.perf_counter() - started))
+
+@bp.cli.command('build-assets')
+def build_assets_command():
+  """Build the hashed, precompressed static files served under /assets.
+  Run on each deploy; restart the workers to pick up the new names."""
+  from assets import build_assets
+  target = current_app.config['ASSETS_BUILD_DIR']
+  manifest = build_assets(current_app.static_folder, target)
+  print('{} files built into {}'.format(len(manifest), target))
@@ -10,4 +10,72 @@ DEBUG = True
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
 # TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = "postgres://{}:{}@{}/{}".format('postgres', '1234', 'localhost:5432', 'fyyur')
\ No newline at end of file
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    "DATABASE_URL",
+    "postgres://{}:{}@{}/{}".format('postgres', '1234', 'localhost:5432', 'fyyur')
+)
+# Connection pool of each engine; pool_pre_ping replaces connections the
+# server has dropped, pool_recycle retires them before a proxy or
+# firewall would. DB_STATEMENT_TIMEOUT (ms, 0 for none) cancels any
+# statement that runs longer
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': True,
+}
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))
+
+# Read replicas (comma-separated URLs) for the read-only endpoints below;
+# a client reads from the primary for REPLICA_STICKY_SECONDS after it
+# submits a form
+SQLALCHEMY_REPLICA_URIS = [uri for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri]
+REPLICA_ENDPOINTS = ('pages.venues', 'pages.artists', 'pages.shows', 'pages.show_*', 'pages.search_*',
+                     'pages.browse_*', 'pages.export_*', 'api.*')
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+# Search backend: 'postgres' (trigram indexes), 'memory' (in-process
+# inverted index) or 'auto' to pick by database dialect
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+
+# Send the venue, artist and show listings while they are still being
+# read from the database instead of rendering them in one piece
+STREAM_TEMPLATES = os.environ.get('STREAM_TEMPLATES') == '1'
+
+# Build the /autocomplete index when the app starts instead of on the
+# first keystroke
+AUTOCOMPLETE_WARM = os.environ.get('AUTOCOMPLETE_WARM', '1') == '1'
+
+# Rendered venue/artist page bodies kept per worker (size in characters,
+# ttl in seconds)
+FRAGMENT_CACHE_MAX_ENTRIES = 1000
+FRAGMENT_CACHE_MAX_SIZE = 64 * 1024 * 1024
+FRAGMENT_CACHE_TTL = 300
+
+# Genre facet counts kept per worker and filter (ttl in seconds); a
+# venue or artist change made by the same worker retires them at once
+FACET_CACHE_MAX_ENTRIES = 1000
+FACET_CACHE_TTL = 60
+
+# Count and time the SQL run by each request: totals go out in X-DB-*
+# headers and the last SQL_PROFILING_HISTORY requests are listed at
+# /_debug/requests; a statement repeated more than the threshold within
+# one request is logged as a warning
+SQL_PROFILING = os.environ.get('SQL_PROFILING') == '1'
+SQL_PROFILING_HISTORY = 200
+SQL_PROFILING_REPEAT_THRESHOLD = 10
+
+# Logs are written as JSON lines by a background thread, to stderr and,
+# outside debug mode, to LOG_FILE. LOG_SAMPLING keeps only the given
+# share of the debug records of a logger, e.g. {'fyyur.models': 0.01}
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FILE = os.environ.get('LOG_FILE', 'error.log')
+LOG_SAMPLING = {'fyyur.models': 0.01}
+
+# city, state -> coordinates table used to place venues on the map
+GEOCODE_FILE = os.environ.get('GEOCODE_FILE', os.path.join(basedir, 'geocodes.csv'))
+
+# Built by `flask build-assets`: hashed, precompressed copies of the
+# static folder, served under /assets and cached by browsers for a year
+ASSETS_BUILD_DIR = os.environ.get('ASSETS_BUILD_DIR', os.path.join(basedir, 'build', 'static'))
@@ -0,0 +1,223 @@
+"""Deterministic synthetic venues, artists and shows at production scale.
+
+A ``Dataset`` is fully determined by its seed and sizes, so the same
+options always give the same rows (show times are laid out around the
+day the data is generated). Popularity is skewed the way real traffic
+is: cities, genres, venues and artists are drawn from Zipf-like
+distributions, so a few venues and artists have hundreds of shows while
+most have a handful, and shows cluster on evenings and weekends.
+
+Shows are laid out in slots one show long, from a year back to three
+months ahead; within a slot a venue or artist plays at most once, so no
+booking overlaps.
+"""
+import csv
+import datetime
+import random
+from bisect import bisect_right
+from itertools import accumulate
+
+from sqlalchemy import text
+
+from forms import genres_choices
+from importer import batched, copy_shows
+from models import db, recount_shows, create_show_partitions, months_between, Venue, Artist, Show, SHOW_DURATION
+from search import reset_indexes
+
+SHOWS_PER_ENTITY = 20
+PAST_DAYS = 365
+UPCOMING_DAYS = 90
+# relative number of shows per slot of the day (three-hour slots from
+# midnight) and per weekday (Monday first)
+SLOT_WEIGHTS = (0.15, 0.02, 0.0, 0.02, 0.1, 0.3, 1.0, 0.7)
+WEEKDAY_WEIGHTS = (0.6, 0.6, 0.7, 0.9, 1.5, 1.8, 1.0)
+
+GENRES = [value for value, _ in genres_choices]
+ADJECTIVES = ('Blue', 'Golden', 'Red', 'Velvet', 'Electric', 'Rusty', 'Silver', 'Midnight',
+              'Lucky', 'Copper', 'Crystal', 'Wild', 'Old', 'Little', 'Grand', 'Hidden')
+NOUNS = ('Note', 'Lantern', 'Anchor', 'Fox', 'Owl', 'Garden', 'Cellar', 'Barrel',
+         'Palace', 'Star', 'Harbor', 'Mill', 'Crow', 'River')
+VENUE_KINDS = ('Hall', 'Lounge', 'Club', 'Theater', 'Bar', 'Ballroom', 'Tavern', 'Stage', 'House')
+FIRST_NAMES = ('Ada', 'Billie', 'Carlos', 'Dee', 'Etta', 'Frankie', 'Gus', 'Hana', 'Ike', 'Jo',
+               'Kiko', 'Lou', 'Mavis', 'Nina', 'Otis', 'Patti', 'Ray', 'Sade', 'Theo', 'Zora')
+LAST_NAMES = ('Adams', 'Brooks', 'Cruz', 'Diaz', 'Ellis', 'Fox', 'Gray', 'Hayes', 'Ito', 'James',
+              'King', 'Lane', 'Moss', 'Nash', 'Owens', 'Park', 'Reed', 'Stone', 'Vega', 'Wolfe')
+STREETS = ('Main', 'Market', 'Mission', 'Broadway', 'Elm', 'Oak', 'Pine', 'Union', 'Water', 'Church')
+
+
+def zipf_cum_weights(n, skew):
+    # cumulative weights of ranks 1..n, for random.choices()
+    return list(accumulate((rank ** -skew for rank in range(1, n + 1))))
+
+
+def read_cities(path):
+    # (city, state, latitude, longitude) per row of the geocode table
+    with open(path, newline='') as f:
+        return [(row['city'], row['state'], float(row['latitude']), float(row['longitude']))
+                for row in csv.DictReader(f)]
+
+
+def default_counts(shows):
+    # venues and artists for a number of shows, at the same density
+    # whatever the scale
+    count = max(100, shows // SHOWS_PER_ENTITY)
+    return count, count
+
+
+class Dataset(object):
+    """The rows of one synthetic dataset; ids run from 1 in each table.
+
+    Rank 1 is the most popular venue or artist, so id 1 has the most
+    shows; the load test picks pages with the same weights.
+    """
+
+    def __init__(self, cities, shows, venues=None, artists=None, skew=1.0, seed=0, now=None):
+        default_venues, default_artists = default_counts(shows)
+        self.shows = shows
+        self.venues = venues or default_venues
+        self.artists = artists or default_artists
+        self.skew = skew
+        self.seed = seed
+        self.now = now or datetime.datetime.now()
+        # the biggest cities are a random few, not the first in the file
+        self.cities = list(cities)
+        random.Random('{}-cities'.format(seed)).shuffle(self.cities)
+        self.city_weights = zipf_cum_weights(len(self.cities), skew)
+        self.genre_weights = zipf_cum_weights(len(GENRES), skew)
+        self.venue_weights = zipf_cum_weights(self.venues, skew)
+        self.artist_weights = zipf_cum_weights(self.artists, skew)
+
+    def random(self, stream):
+        # one generator per table, so the venues are the same whatever
+        # the number of shows
+        return random.Random('{}-{}'.format(self.seed, stream))
+
+    def pick_city(self, rnd):
+        return self.cities[bisect_right(self.city_weights, rnd.random() * self.city_weights[-1])]
+
+    def pick_genres(self, rnd, count):
+        return sorted(set(rnd.choices(GENRES, cum_weights=self.genre_weights, k=count)))
+
+    def venue_rows(self):
+        rnd = self.random('venues')
+        for i in range(self.venues):
+            city, state, latitude, longitude = self.pick_city(rnd)
+            name = 'The {} {} {}'.format(rnd.choice(ADJECTIVES), rnd.choice(NOUNS), rnd.choice(VENUE_KINDS))
+            seeking_talent = rnd.random() < 0.3
+            yield {
+                'id': i + 1,
+                'name': name,
+                'city': city,
+                'state': state,
+                'address': '{} {} St'.format(rnd.randint(1, 2999), rnd.choice(STREETS)),
+                'phone': '{:03d}-{:03d}-{:04d}'.format(rnd.randint(200, 999), rnd.randint(200, 999),
+                                                       rnd.randint(0, 9999)),
+                'genres': self.pick_genres(rnd, rnd.randint(1, 3)),
+                'website': 'https://venue{}.example.com'.format(i + 1),
+                'facebook_link': 'https://www.facebook.com/venue{}'.format(i + 1),
+                'seeking_talent': seeking_talent,
+                'seeking_description': 'Looking for local acts.' if seeking_talent else None,
+                # spread over about 50 km around the city centre
+                'latitude': latitude + rnd.uniform(-0.25, 0.25),
+                'longitude': longitude + rnd.uniform(-0.3, 0.3),
+            }
+
+    def artist_rows(self):
+        rnd = self.random('artists')
+        for i in range(self.artists):
+            city, state, _, _ = self.pick_city(rnd)
+            if rnd.random() < 0.5:
+                name = '{} {}'.format(rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES))
+            else:
+                name = 'The {} {}s'.format(rnd.choice(ADJECTIVES), rnd.choice(NOUNS))
+            seeking_venue = rnd.random() < 0.4
+            yield {
+                'id': i + 1,
+                'name': name,
+                'city': city,
+                'state': state,
+                'phone': '{:03d}-{:03d}-{:04d}'.format(rnd.randint(200, 999), rnd.randint(200, 999),
+                                                       rnd.randint(0, 9999)),
+                'genres': self.pick_genres(rnd, rnd.randint(1, 2)),
+                'website': 'https://artist{}.example.com'.format(i + 1),
+                'facebook_link': 'https://www.facebook.com/artist{}'.format(i + 1),
+                'seeking_venue': seeking_venue,
+                'seeking_description': 'Looking for gigs.' if seeking_venue else None,
+            }
+
+    def slot_counts(self):
+        # (start time, number of shows) per slot, the shows shared out in
+        # proportion to the slot weights by largest remainder
+        hours = int(SHOW_DURATION.total_seconds() // 3600)
+        midnight = self.now.replace(hour=0, minute=0, second=0, microsecond=0)
+        slots = []
+        for day in range(-PAST_DAYS, UPCOMING_DAYS):
+            date = midnight + datetime.timedelta(days=day)
+            for k, weight in enumerate(SLOT_WEIGHTS[:24 // hours]):
+                weight *= WEEKDAY_WEIGHTS[date.weekday()]
+                if weight:
+                    slots.append((date + datetime.timedelta(hours=hours * k), weight))
+        total = sum(weight for _, weight in slots)
+        shares = [self.shows * weight / total for _, weight in slots]
+        counts = [int(share) for share in shares]
+        by_remainder = sorted(range(len(slots)), key=lambda i: counts[i] - shares[i])
+        for i in by_remainder[:self.shows - sum(counts)]:
+            counts[i] += 1
+        busiest = max(counts)
+        if busiest * 2 > min(self.venues, self.artists):
+            raise ValueError('{} shows need at least {} venues and artists'.format(self.shows, busiest * 2))
+        return [(start_time, count) for (start_time, _), count in zip(slots, counts) if count]
+
+    def show_rows(self):
+        rnd = self.random('shows')
+        for start_time, count in self.slot_counts():
+            venue_ids = pick_distinct(rnd, self.venue_weights, count)
+            artist_ids = pick_distinct(rnd, self.artist_weights, count)
+            for venue_id, artist_id in zip(venue_ids, artist_ids):
+                yield {
+                    'venue_id': venue_id,
+                    'artist_id': artist_id,
+                    'start_time': start_time,
+                    'end_time': start_time + SHOW_DURATION,
+                    'counted_upcoming': start_time > self.now,
+                }
+
+
+def pick_distinct(rnd, cum_weights, count, rounds=10):
+    # ``count`` different ids (1-based), drawn by weight; the little that
+    # is still missing after a few rounds is drawn uniformly
+    n = len(cum_weights)
+    picked = set()
+    for _ in range(rounds):
+        if len(picked) == count:
+            break
+        picked.update(rnd.choices(range(1, n + 1), cum_weights=cum_weights, k=count - len(picked)))
+    while len(picked) < count:
+        picked.add(rnd.randint(1, n))
+    ids = sorted(picked)
+    rnd.shuffle(ids)
+    return ids
+
+
+def load_dataset(dataset, batch_size=5000):
+    """Insert ``dataset`` into empty tables and rebuild what derives from it."""
+    for model, rows in ((Venue, dataset.venue_rows()), (Artist, dataset.artist_rows())):
+        for batch in batched(rows, batch_size):
+            db.session.execute(model.__table__.insert(), batch)
+        # the ids were given, so the sequence is still at the start
+        db.session.execute(text("SELECT setval(pg_get_serial_sequence('\"{0}\"', 'id'), "
+                                "(SELECT max(id) FROM \"{0}\"))".format(model.__tablename__)))
+    # the shows go straight to their months, not through the default partition
+    create_show_partitions(months_between(dataset.now - datetime.timedelta(days=PAST_DAYS),
+                                          dataset.now + datetime.timedelta(days=UPCOMING_DAYS)))
+    connection = db.session.connection()
+    cursor = connection.connection.cursor()
+    use_copy = hasattr(cursor, 'copy_expert')
+    for batch in batched(dataset.show_rows(), batch_size):
+        if use_copy:
+            copy_shows(cursor, batch)
+        else:
+            db.session.execute(Show.__table__.insert(), batch)
+    db.session.commit()
+    recount_shows(dataset.now)
+    reset_indexes()
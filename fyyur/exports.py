@@ -0,0 +1,89 @@
+"""Show feeds as iCalendar and CSV, encoded row by row.
+
+The encoders are generators over the rows of a streamed query, so an
+export of any size is sent in chunks of ``CHUNK_ROWS`` rows without ever
+being held in memory.
+"""
+import csv
+from datetime import datetime, timezone
+
+CHUNK_ROWS = 200
+CSV_COLUMNS = ('id', 'start_time', 'end_time', 'venue_id', 'venue_name',
+               'artist_id', 'artist_name')
+ICS_DATETIME = '%Y%m%dT%H%M%S'
+
+
+def chunked(lines, size=CHUNK_ROWS):
+    # joins ``size`` encoded rows per chunk, so each write to the
+    # socket carries more than one short line
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+class _Line(object):
+    # a csv.writer target that hands the formatted row back
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        yield writer.writerow((row.id, row.start_time.isoformat(), row.end_time.isoformat(),
+                               row.venue_id, row.venue_name, row.artist_id, row.artist_name))
+
+
+def ics_text(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(
+        ',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def ics_line(name, value):
+    # content lines longer than 75 octets are folded (RFC 5545, 3.1)
+    line = '{}:{}'.format(name, value).encode()
+    parts = []
+    width = 75
+    while len(line) > width:
+        cut = width
+        # never split a UTF-8 sequence
+        while (line[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(line[:cut])
+        line = line[cut:]
+        width = 74  # continuation lines start with a space
+    parts.append(line)
+    return '\r\n '.join(part.decode() for part in parts) + '\r\n'
+
+
+def ics_lines(rows, name, host='fyyur'):
+    """A VCALENDAR named ``name`` with one VEVENT per show row.
+
+    Show times are stored without a time zone and are written as
+    floating local times.
+    """
+    stamp = datetime.now(timezone.utc).strftime(ICS_DATETIME + 'Z')
+    yield ''.join((
+        ics_line('BEGIN', 'VCALENDAR'),
+        ics_line('VERSION', '2.0'),
+        ics_line('PRODID', '-//fyyur//shows//EN'),
+        ics_line('X-WR-CALNAME', ics_text(name)),
+    ))
+    for row in rows:
+        yield ''.join((
+            ics_line('BEGIN', 'VEVENT'),
+            ics_line('UID', 'show-{}@{}'.format(row.id, host)),
+            ics_line('DTSTAMP', stamp),
+            ics_line('DTSTART', row.start_time.strftime(ICS_DATETIME)),
+            ics_line('DTEND', row.end_time.strftime(ICS_DATETIME)),
+            ics_line('SUMMARY', ics_text('{} at {}'.format(row.artist_name, row.venue_name))),
+            ics_line('LOCATION', ics_text(row.venue_name)),
+            ics_line('END', 'VEVENT'),
+        ))
+    yield ics_line('END', 'VCALENDAR')
@@ -0,0 +1,21 @@
+"""Extension objects shared by the app and its blueprints.
+
+They are created unbound, like ``models.db``, and tied to the app by
+``create_app()``; there is one app per process.
+"""
+from flask_moment import Moment
+
+from assets import Assets
+from cache import FragmentCache
+from profiling import SQLProfiler
+from routing import ReplicaRouter
+
+moment = Moment()
+# rendered venue/artist page bodies
+fragment_cache = FragmentCache()
+# genre facets and other aggregates over a whole table
+facet_cache = FragmentCache()
+sql_profiler = SQLProfiler()
+replica_router = ReplicaRouter()
+# fingerprinted static files, once built
+assets = Assets()
@@ -0,0 +1,58 @@
+"""Jinja filters.
+
+babel and dateutil are imported on the first use of the filter, not
+when the app starts.
+"""
+import functools
+
+from markupsafe import Markup, escape
+
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+# babel's own names, for the ones DATETIME_FORMATS does not override
+BABEL_FORMATS = ('short', 'medium', 'long', 'full')
+
+@functools.lru_cache(maxsize=64)
+def compile_datetime_format(format, locale):
+  # babel pattern and locale objects, parsed once per (format, locale)
+  import babel
+  import babel.dates
+  locale = babel.Locale.parse(locale or babel.dates.LC_TIME)
+  if format in DATETIME_FORMATS:
+    pattern = DATETIME_FORMATS[format]
+  elif format in BABEL_FORMATS:
+    # the locale's date and time patterns, joined as babel.dates.format_datetime() does
+    pattern = babel.dates.get_datetime_format(format, locale).replace(
+      '{0}', babel.dates.get_time_format(format, locale).pattern).replace(
+      '{1}', babel.dates.get_date_format(format, locale).pattern)
+  else:
+    pattern = format
+  return babel.dates.parse_pattern(pattern), locale
+
+def format_datetime(value, format='medium', locale=None):
+  if isinstance(value, str):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  pattern, locale = compile_datetime_format(format, locale)
+  return pattern.apply(value, locale)
+
+def highlight(value, spans):
+  # wrap the (start, end) spans returned by search in <mark> tags
+  if not value or not spans:
+    return value
+  parts = []
+  last = 0
+  for start, end in spans:
+    parts.append(escape(value[last:start]))
+    parts.append(Markup('<mark>%s</mark>') % value[start:end])
+    last = end
+  parts.append(escape(value[last:]))
+  return Markup('').join(parts)
+
+FILTERS = {
+  'datetime': format_datetime,
+  'highlight': highlight,
+}
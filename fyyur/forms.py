@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, ValidationError
-from wtforms.validators import DataRequired, AnyOf, URL, Length
+from wtforms.validators import DataRequired, AnyOf, URL, Length, Optional
 import re
 
 state_choices = [
@@ -82,7 +82,7 @@ genres_choices = [
 
 class VenueForm(Form):
     def validate_phone(self, field):
-        if not re.search(r"^[0-9]{3}-[0-9]{3}-[0-9]{4}$", field.data):
+        if not re.search(r"^[0-9]{3}-[0-9]{3}-[0-9]{4}$", field.data or ''):
             raise ValidationError("Invalid phone number.")
 
     def validate_genres(self, field):
@@ -132,7 +132,7 @@ class VenueForm(Form):
 # TODO IMPLEMENT NEW ARTIST FORM AND NEW SHOW FORM
 class ArtistForm(Form):
     def validate_phone(self, field):
-        if not re.search(r"^[0-9]{3}-[0-9]{3}-[0-9]{4}$", field.data):
+        if not re.search(r"^[0-9]{3}-[0-9]{3}-[0-9]{4}$", field.data or ''):
             raise ValidationError("Invalid phone number.")
 
     def validate_genres(self, field):
@@ -189,3 +189,8 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default=datetime.today()
     )
+    # empty means the default show length (models.SHOW_DURATION)
+    end_time = DateTimeField(
+        'end_time',
+        validators=[Optional()]
+    )
@@ -0,0 +1,25 @@
+"""Venue coordinates from a local city/state table (GEOCODE_FILE).
+
+Venues are placed at the centre of their city. There is no network
+lookup, so creating or importing a venue never waits on a geocoder.
+"""
+import csv
+import functools
+
+from flask import current_app
+
+
+@functools.lru_cache(maxsize=4)
+def load_geocodes(path):
+    with open(path, newline='') as f:
+        return dict(((row['city'].strip().lower(), row['state'].strip().upper()),
+                     (float(row['latitude']), float(row['longitude'])))
+                    for row in csv.DictReader(f))
+
+
+def geocode(city, state):
+    # (latitude, longitude), or (None, None) for a city not in the table
+    if not city or not state:
+        return None, None
+    return load_geocodes(current_app.config['GEOCODE_FILE']).get(
+        (city.strip().lower(), state.strip().upper()), (None, None))
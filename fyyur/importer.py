@@ -0,0 +1,308 @@
+"""Bulk import of venues, artists and shows from CSV or JSONL files.
+
+Every row is validated with the same form classes the create pages use.
+Venue and artist rows carry their own ``id``; shows refer to those ids
+and are translated to database ids through an in-memory map. Files
+imported without venues/artists refer to rows already in the database.
+Venues are placed from their ``latitude``/``longitude`` columns when the
+file has them and from the geocode table otherwise.
+"""
+import csv
+import datetime
+import io
+import json
+import sys
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import islice
+
+from werkzeug.datastructures import MultiDict
+
+from forms import VenueForm, ArtistForm, ShowForm
+from geocode import geocode
+from models import db, recount_shows, show_period, Venue, Artist, Show
+from search import reset_indexes
+
+VENUE_COLUMNS = ('name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+                 'facebook_link', 'website', 'seeking_talent', 'seeking_description')
+ARTIST_COLUMNS = ('name', 'city', 'state', 'phone', 'genres', 'image_link',
+                  'facebook_link', 'website', 'seeking_venue', 'seeking_description')
+BOOLEAN_FIELDS = ('seeking_talent', 'seeking_venue')
+FALSE_VALUES = ('', '0', 'false', 'no', 'n', 'f')
+MAX_REPORTED_ERRORS = 20
+
+
+def read_rows(path):
+    # (line number, dict) per record; CSV genres are separated by ';'
+    with open(path, newline='') as f:
+        if path.endswith('.jsonl'):
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield number, json.loads(line)
+        else:
+            for number, row in enumerate(csv.DictReader(f), 2):
+                if row.get('genres'):
+                    row['genres'] = [genre.strip() for genre in row['genres'].split(';')]
+                yield number, row
+
+
+def to_formdata(row):
+    formdata = MultiDict()
+    for key, value in row.items():
+        if key in BOOLEAN_FIELDS:
+            # BooleanField treats any non-empty value as checked
+            if str(value).lower() not in FALSE_VALUES:
+                formdata.add(key, 'y')
+        elif isinstance(value, list):
+            for item in value:
+                formdata.add(key, item)
+        elif value is not None:
+            formdata.add(key, str(value))
+    return formdata
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ImportStats(object):
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.imported = 0
+        self.errors = []
+
+    def error(self, number, message):
+        self.errors.append((number, message))
+        if len(self.errors) <= MAX_REPORTED_ERRORS:
+            print('{} line {}: {}'.format(self.kind, number, message), file=sys.stderr)
+
+    def __str__(self):
+        return '{}: {} imported, {} rejected'.format(self.kind, self.imported, len(self.errors))
+
+
+class RowValidator(object):
+    """Runs a form's validators over plain rows.
+
+    The validators in forms.py only look at their own field, so each
+    field's outcome is remembered per raw value: a bulk file repeats the
+    same venue ids, artist ids and start times over and over, and those
+    are then processed and validated once.
+    """
+
+    def __init__(self, form_class, cache_size=100000):
+        self.form = form_class(meta={'csrf': False})
+        self.cache_size = cache_size
+        self.results = {}
+        self.inline = dict((name, [getattr(form_class, 'validate_' + name)])
+                           for name in self.form._fields
+                           if hasattr(form_class, 'validate_' + name))
+
+    def validate_field(self, name, field, formdata):
+        key = (name, tuple(formdata.getlist(name)))
+        result = self.results.get(key)
+        if result is None:
+            if len(self.results) >= self.cache_size:
+                self.results.clear()
+            field.process(formdata)
+            field.validate(self.form, self.inline.get(name, ()))
+            result = self.results[key] = (field.data, list(field.errors))
+        return result
+
+    def validate(self, row):
+        formdata = to_formdata(row)
+        data, errors = {}, []
+        for name, field in self.form._fields.items():
+            data[name], field_errors = self.validate_field(name, field, formdata)
+            if field_errors:
+                errors.append('{}: {}'.format(name, ', '.join(field_errors)))
+        if errors:
+            return None, '; '.join(errors)
+        return data, None
+
+
+class IdMap(object):
+    """Source id -> database id for one model."""
+
+    def __init__(self, model):
+        self.model = model
+        self.ids = {}
+
+    @classmethod
+    def existing(cls, model):
+        # rows already in the database keep their own ids
+        id_map = cls(model)
+        for (entity_id,) in db.session.query(model.id).yield_per(10000):
+            id_map.ids[str(entity_id)] = entity_id
+        return id_map
+
+    def get(self, source_id):
+        return self.ids.get(str(source_id).strip())
+
+
+class BookingCalendar(object):
+    """Booked periods per venue or artist, for overlap checks in memory.
+
+    The periods of one key never overlap, so sorted by start they are
+    also sorted by end: a new period can only clash with its two
+    neighbours, found by bisection.
+    """
+
+    def __init__(self):
+        self.starts = defaultdict(list)
+        self.ends = defaultdict(list)
+
+    def is_free(self, key, start_time, end_time):
+        starts, ends = self.starts[key], self.ends[key]
+        i = bisect_right(starts, start_time)
+        return (i == 0 or ends[i - 1] <= start_time) and (i == len(starts) or starts[i] >= end_time)
+
+    def book(self, key, start_time, end_time):
+        starts, ends = self.starts[key], self.ends[key]
+        i = bisect_right(starts, start_time)
+        starts.insert(i, start_time)
+        ends.insert(i, end_time)
+
+    @classmethod
+    def existing(cls, column):
+        calendar = cls()
+        for key, start_time, end_time in db.session.query(
+                column, Show.start_time, Show.end_time).order_by(column, Show.start_time).yield_per(10000):
+            calendar.starts[key].append(start_time)
+            calendar.ends[key].append(end_time)
+        return calendar
+
+
+def venue_location(row, data):
+    # coordinates given in the file win over the geocode table
+    if row.get('latitude') in (None, '') or row.get('longitude') in (None, ''):
+        return geocode(data['city'], data['state'])
+    try:
+        latitude, longitude = float(row['latitude']), float(row['longitude'])
+    except ValueError:
+        raise ValueError('latitude and longitude must be numbers')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('latitude or longitude out of range')
+    return latitude, longitude
+
+
+def import_entities(model, columns, path, batch_size):
+    stats = ImportStats(model.__tablename__)
+    id_map = IdMap(model)
+    validator = RowValidator(VenueForm if model is Venue else ArtistForm)
+    table = model.__table__
+    # ids come back in parameter order, so they line up with the batch
+    insert = table.insert().returning(table.c.id, sort_by_parameter_order=True)
+
+    def valid_rows():
+        for number, row in read_rows(path):
+            data, error = validator.validate(row)
+            if error:
+                stats.error(number, error)
+                continue
+            values = dict((column, data[column]) for column in columns)
+            if model is Venue:
+                try:
+                    values['latitude'], values['longitude'] = venue_location(row, data)
+                except ValueError as e:
+                    stats.error(number, str(e))
+                    continue
+            yield row.get('id'), values
+
+    for batch in batched(valid_rows(), batch_size):
+        ids = db.session.execute(insert, [values for _, values in batch]).scalars().all()
+        for (source_id, _), entity_id in zip(batch, ids):
+            if source_id is not None:
+                id_map.ids[str(source_id).strip()] = entity_id
+        stats.imported += len(batch)
+    db.session.commit()
+    return id_map, stats
+
+
+def copy_shows(cursor, batch):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        (show['venue_id'], show['artist_id'], show['start_time'].isoformat(),
+         show['end_time'].isoformat(), show['counted_upcoming'])
+        for show in batch)
+    buffer.seek(0)
+    cursor.copy_expert('COPY "Show" (venue_id, artist_id, start_time, end_time, counted_upcoming) '
+                       'FROM STDIN WITH CSV', buffer)
+
+
+def import_shows(path, batch_size, venue_ids, artist_ids):
+    # inserted past the ORM, so the counters are rebuilt afterwards;
+    # double bookings are rejected here, before the exclusion
+    # constraints would fail the whole batch
+    stats = ImportStats('Show')
+    validator = RowValidator(ShowForm)
+    venue_calendar = BookingCalendar.existing(Show.venue_id)
+    artist_calendar = BookingCalendar.existing(Show.artist_id)
+    connection = db.session.connection()
+    cursor = connection.connection.cursor()
+    use_copy = connection.dialect.name == 'postgresql' and hasattr(cursor, 'copy_expert')
+
+    now = datetime.datetime.now()
+
+    def valid_rows():
+        for number, row in read_rows(path):
+            data, error = validator.validate(row)
+            if error:
+                stats.error(number, error)
+                continue
+            venue_id = venue_ids.get(data['venue_id'])
+            artist_id = artist_ids.get(data['artist_id'])
+            if venue_id is None or artist_id is None:
+                stats.error(number, 'unknown {}'.format('venue_id' if venue_id is None else 'artist_id'))
+                continue
+            try:
+                start_time, end_time = show_period(data['start_time'], data['end_time'])
+            except ValueError as e:
+                stats.error(number, str(e))
+                continue
+            if not venue_calendar.is_free(venue_id, start_time, end_time):
+                stats.error(number, 'venue already booked')
+                continue
+            if not artist_calendar.is_free(artist_id, start_time, end_time):
+                stats.error(number, 'artist already booked')
+                continue
+            venue_calendar.book(venue_id, start_time, end_time)
+            artist_calendar.book(artist_id, start_time, end_time)
+            # filed in the right counter now, so the recount rewrites no rows
+            yield {'venue_id': venue_id, 'artist_id': artist_id,
+                   'start_time': start_time, 'end_time': end_time,
+                   'counted_upcoming': start_time > now}
+
+    for batch in batched(valid_rows(), batch_size):
+        if use_copy:
+            copy_shows(cursor, batch)
+        else:
+            db.session.execute(Show.__table__.insert(), batch)
+        stats.imported += len(batch)
+    db.session.commit()
+    return stats
+
+
+def import_files(venues=None, artists=None, shows=None, batch_size=5000):
+    """Import the given files in dependency order and return their stats."""
+    results = []
+    if venues:
+        venue_ids, stats = import_entities(Venue, VENUE_COLUMNS, venues, batch_size)
+        results.append(stats)
+    elif shows:
+        venue_ids = IdMap.existing(Venue)
+    if artists:
+        artist_ids, stats = import_entities(Artist, ARTIST_COLUMNS, artists, batch_size)
+        results.append(stats)
+    elif shows:
+        artist_ids = IdMap.existing(Artist)
+    if shows:
+        results.append(import_shows(shows, batch_size, venue_ids, artist_ids))
+        recount_shows()
+    reset_indexes()
+    return results
@@ -0,0 +1,97 @@
+"""Serialization and conditional GET helpers for the /api/v1 routes.
+
+JSON is encoded with orjson when it is installed (datetimes included)
+and with the standard library otherwise, or for json.dumps() arguments
+orjson lacks; both write datetimes as ISO 8601 strings.
+"""
+import datetime
+import functools
+import hashlib
+import json
+
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_ARGUMENTS = {'sort_keys', 'indent', 'ensure_ascii', 'default'}
+
+
+def _default(value, fallback=None):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if fallback is not None:
+        return fallback(value)
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def _orjson_option(sort_keys=False, indent=None, ensure_ascii=False, default=None):
+    # the orjson option for these json.dumps() arguments, or None if
+    # orjson cannot honour them (it never escapes non-ASCII and only
+    # indents by two)
+    if ensure_ascii or indent not in (None, 2):
+        return None
+    return (orjson.OPT_SORT_KEYS if sort_keys else 0) | (orjson.OPT_INDENT_2 if indent else 0)
+
+
+def dumps(data, **kwargs):
+    """``data`` as UTF-8 encoded JSON.
+
+    Takes the json.dumps() arguments; ``sort_keys``, ``indent=2`` and
+    ``default`` are passed to orjson, anything else is encoded with the
+    standard library.
+    """
+    if orjson is not None and set(kwargs) <= ORJSON_ARGUMENTS:
+        option = _orjson_option(**kwargs)
+        if option is not None:
+            return orjson.dumps(data, default=kwargs.get('default'), option=option)
+    kwargs['default'] = functools.partial(_default, fallback=kwargs.get('default'))
+    kwargs.setdefault('separators', (',', ':'))
+    return json.dumps(data, **kwargs).encode()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Makes ``jsonify`` use the same encoder as the API."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, **kwargs).decode()
+
+    def response(self, *args, **kwargs):
+        return self._app.response_class(
+            dumps(self._prepare_response_obj(args, kwargs)), mimetype=self.mimetype)
+
+
+def make_etag(*parts):
+    # a strong validator for whatever ``parts`` identify
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def is_fresh(etag):
+    return etag in request.if_none_match
+
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def json_response(data, etag=None, status=200):
+    """JSON response tagged with ``etag`` (by default, a digest of the body).
+
+    Answers 304 when the request already holds that ETag; clients are
+    asked to revalidate on every use.
+    """
+    body = dumps(data)
+    if etag is None:
+        etag = hashlib.sha1(body).hexdigest()
+    if status == 200 and is_fresh(etag):
+        return not_modified(etag)
+    response = Response(body, status=status, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,260 @@
+"""Load test for a running fyyur server.
+
+Drives every page and API route of a server loaded with
+``flask generate-data`` from a number of concurrent clients, and reports
+throughput and latency percentiles per route. Give the same --shows,
+--venues, --artists, --skew and --seed as to generate-data: detail pages
+are then requested with the popularity the data was generated with.
+
+    FLASK_APP=app.py flask generate-data --shows 1000000
+    gunicorn -w 4 'app:create_app()' &
+    python loadtest.py --base-url http://localhost:8000 --shows 1000000 --output baseline.json
+
+Later runs with --baseline baseline.json print the change per route.
+The create and edit routes change the data, so they are only driven
+with --writes; deletes are never sent.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import math
+import random
+import statistics
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from itertools import accumulate
+from urllib.parse import urlencode, urlsplit
+
+from datagen import Dataset, read_cities, ADJECTIVES, NOUNS, VENUE_KINDS, FIRST_NAMES, LAST_NAMES
+
+Route = namedtuple('Route', 'name weight request')
+WORDS = ADJECTIVES + NOUNS + VENUE_KINDS + FIRST_NAMES + LAST_NAMES
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def pick_id(rnd, cum_weights):
+    return bisect_right(cum_weights, rnd.random() * cum_weights[-1]) + 1
+
+
+def venue_id(rnd, dataset):
+    return pick_id(rnd, dataset.venue_weights)
+
+
+def artist_id(rnd, dataset):
+    return pick_id(rnd, dataset.artist_weights)
+
+
+def city_args(rnd, dataset):
+    city, state, _, _ = dataset.pick_city(rnd)
+    return {'city': city, 'state': state}
+
+
+def near_args(rnd, dataset):
+    _, _, latitude, longitude = dataset.pick_city(rnd)
+    return {'lat': round(latitude + rnd.uniform(-0.3, 0.3), 4),
+            'lng': round(longitude + rnd.uniform(-0.3, 0.3), 4)}
+
+
+def get(path, **args):
+    return 'GET', path + ('?' + urlencode(args, doseq=True) if args else ''), None
+
+
+def venue_form(rnd, dataset):
+    return dict(city_args(rnd, dataset), name='The {} {}'.format(rnd.choice(ADJECTIVES), rnd.choice(NOUNS)),
+                address='1 Main St', phone='415-555-0100', genres=dataset.pick_genres(rnd, 2),
+                website='https://example.com', facebook_link='https://www.facebook.com/example')
+
+
+def artist_form(rnd, dataset):
+    form = venue_form(rnd, dataset)
+    del form['address']
+    return form
+
+
+def show_form(rnd, dataset):
+    # a free slot is not looked for; a clash is answered with a flash
+    start_time = dataset.now + datetime.timedelta(days=rnd.randint(1, 90), hours=rnd.randint(0, 23))
+    return {'venue_id': venue_id(rnd, dataset), 'artist_id': artist_id(rnd, dataset),
+            'start_time': start_time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+READ_ROUTES = [
+    Route('pages.index', 2, lambda rnd, ds: get('/')),
+    Route('pages.venues', 3, lambda rnd, ds: get('/venues')),
+    Route('pages.artists', 3, lambda rnd, ds: get('/artists', letter=rnd.choice(LETTERS))),
+    Route('pages.show_venue', 12, lambda rnd, ds: get('/venues/{}'.format(venue_id(rnd, ds)))),
+    Route('pages.show_artist', 12, lambda rnd, ds: get('/artists/{}'.format(artist_id(rnd, ds)))),
+    Route('pages.search_venues', 4, lambda rnd, ds: ('POST', '/venues/search', {'search_term': rnd.choice(WORDS)})),
+    Route('pages.search_artists', 4, lambda rnd, ds: ('POST', '/artists/search', {'search_term': rnd.choice(WORDS)})),
+    Route('pages.shows', 5, lambda rnd, ds: get('/shows', **dict(city_args(rnd, ds), upcoming='1'))),
+    Route('pages.create_venue_form', 1, lambda rnd, ds: get('/venues/create')),
+    Route('pages.create_artist_form', 1, lambda rnd, ds: get('/artists/create')),
+    Route('pages.create_shows', 1, lambda rnd, ds: get('/shows/create')),
+    Route('pages.edit_venue', 1, lambda rnd, ds: get('/venues/{}/edit'.format(venue_id(rnd, ds)))),
+    Route('pages.edit_artist', 1, lambda rnd, ds: get('/artists/{}/edit'.format(artist_id(rnd, ds)))),
+    Route('pages.autocomplete_names', 12, lambda rnd, ds: get('/autocomplete', q=rnd.choice(WORDS)[:rnd.randint(1, 4)])),
+    Route('pages.browse_genres', 3, lambda rnd, ds: get('/{}/genres'.format(rnd.choice(('venues', 'artists'))),
+                                                  genre=ds.pick_genres(rnd, 1))),
+    Route('pages.export_entity_calendar', 1, lambda rnd, ds: get('/venues/{}/shows.ics'.format(venue_id(rnd, ds)))),
+    Route('pages.export_shows_csv', 1, lambda rnd, ds: get('/shows.csv', **dict(city_args(rnd, ds), upcoming='1'))),
+    Route('api.api_listing', 1, lambda rnd, ds: get('/api/v1/{}'.format(rnd.choice(('venues', 'artists'))))),
+    Route('api.api_detail', 6, lambda rnd, ds: get('/api/v1/venues/{}'.format(venue_id(rnd, ds)))),
+    Route('api.api_search', 3, lambda rnd, ds: get('/api/v1/artists/search', q=rnd.choice(WORDS))),
+    Route('api.api_genre_facets', 2, lambda rnd, ds: get('/api/v1/venues/genres', **city_args(rnd, ds))),
+    Route('api.api_venues_near', 3, lambda rnd, ds: get('/api/v1/venues/near', **near_args(rnd, ds))),
+    Route('api.api_shows', 3, lambda rnd, ds: get('/api/v1/shows', **city_args(rnd, ds))),
+]
+WRITE_ROUTES = [
+    Route('pages.create_venue_submission', 1, lambda rnd, ds: ('POST', '/venues/create', venue_form(rnd, ds))),
+    Route('pages.create_artist_submission', 1, lambda rnd, ds: ('POST', '/artists/create', artist_form(rnd, ds))),
+    Route('pages.create_show_submission', 2, lambda rnd, ds: ('POST', '/shows/create', show_form(rnd, ds))),
+    Route('pages.edit_venue_submission', 1, lambda rnd, ds: (
+        'POST', '/venues/{}/edit'.format(rnd.randint(1, ds.venues)), venue_form(rnd, ds))),
+    Route('pages.edit_artist_submission', 1, lambda rnd, ds: (
+        'POST', '/artists/{}/edit'.format(rnd.randint(1, ds.artists)), artist_form(rnd, ds))),
+]
+
+
+class Client(threading.Thread):
+    """Sends requests over one keep-alive connection until ``deadline``.
+
+    Only requests started after ``measure_from`` are recorded, so the
+    warm-up stays out of the numbers.
+    """
+
+    def __init__(self, index, options, dataset, routes, measure_from, deadline):
+        super(Client, self).__init__(daemon=True)
+        self.rnd = random.Random('{}-client-{}'.format(options.seed, index))
+        self.url = urlsplit(options.base_url)
+        self.timeout = options.timeout
+        self.dataset = dataset
+        self.routes = routes
+        self.cum_weights = list(accumulate(route.weight for route in routes))
+        self.measure_from = measure_from
+        self.deadline = deadline
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def connect(self):
+        connection_class = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.url.hostname, self.url.port, timeout=self.timeout)
+
+    def run(self):
+        connection = self.connect()
+        while True:
+            started = time.perf_counter()
+            if started >= self.deadline:
+                break
+            route = self.routes[bisect_right(self.cum_weights, self.rnd.random() * self.cum_weights[-1])]
+            method, path, form = route.request(self.rnd, self.dataset)
+            headers = {}
+            body = None
+            if form is not None:
+                body = urlencode(form, doseq=True)
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            try:
+                connection.request(method, self.url.path.rstrip('/') + path, body, headers)
+                response = connection.getresponse()
+                response.read()
+                # the edit forms redirect to the page they changed
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+                connection.close()
+                connection = self.connect()
+            if started >= self.measure_from:
+                self.timings[route.name].append((time.perf_counter() - started) * 1000)
+                if not ok:
+                    self.errors[route.name] += 1
+        connection.close()
+
+
+def percentile(timings, fraction):
+    # nearest rank
+    return timings[max(math.ceil(len(timings) * fraction) - 1, 0)]
+
+
+def summarize(clients, seconds):
+    timings, errors = defaultdict(list), defaultdict(int)
+    for client in clients:
+        for name, values in client.timings.items():
+            timings[name].extend(values)
+            timings['all'].extend(values)
+        for name, count in client.errors.items():
+            errors[name] += count
+            errors['all'] += count
+    results = {}
+    for name, values in timings.items():
+        values.sort()
+        results[name] = {
+            'requests': len(values),
+            'errors': errors[name],
+            'throughput': len(values) / seconds,
+            'p50': statistics.median(values),
+            'p95': percentile(values, 0.95),
+            'p99': percentile(values, 0.99),
+            'max': values[-1],
+        }
+    return results
+
+
+def report(results, baseline=None):
+    print('{:<32} {:>8} {:>6} {:>9} {:>9} {:>9} {:>9} {:>9}'.format(
+        'route', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms'))
+    for name in sorted(results, key=lambda name: (name == 'all', name)):
+        result = results[name]
+        line = '{:<32} {requests:>8} {errors:>6} {throughput:>9.1f} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f} {max:>9.2f}'.format(
+            name, **result)
+        before = (baseline or {}).get(name)
+        if before:
+            line += '   p99 {:+.0%}  req/s {:+.0%}'.format(result['p99'] / before['p99'] - 1,
+                                                       result['throughput'] / before['throughput'] - 1)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--venues', type=int)
+    parser.add_argument('--artists', type=int)
+    parser.add_argument('--skew', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--geocode-file', default='geocodes.csv')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=60, help='seconds measured')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds before measuring')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--writes', action='store_true', help='also submit the create and edit forms')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with the results of an earlier --output')
+    options = parser.parse_args()
+
+    dataset = Dataset(read_cities(options.geocode_file), options.shows, options.venues,
+                      options.artists, options.skew, options.seed)
+    routes = READ_ROUTES + (WRITE_ROUTES if options.writes else [])
+    measure_from = time.perf_counter() + options.warmup
+    deadline = measure_from + options.duration
+    clients = [Client(i, options, dataset, routes, measure_from, deadline)
+               for i in range(options.concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+
+    results = summarize(clients, options.duration)
+    baseline = None
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)['results']
+    report(results, baseline)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump({'options': vars(options), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
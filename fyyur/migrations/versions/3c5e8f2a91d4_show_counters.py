@@ -0,0 +1,40 @@
+"""show counters
+
+Revision ID: 3c5e8f2a91d4
+Revises: a79e7340047e
+Create Date: 2026-10-18 10:12:41.508211
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5e8f2a91d4'
+down_revision = 'a79e7340047e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('counted_upcoming', sa.Boolean(), server_default='false', nullable=False))
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    # backfill the counters from the existing shows
+    op.execute('UPDATE "Show" SET counted_upcoming = start_time > now()')
+    for table, fk in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.execute(
+            'UPDATE "{table}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{fk} = "{table}".id AND counted_upcoming), '
+            'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{fk} = "{table}".id AND NOT counted_upcoming)'
+            .format(table=table, fk=fk)
+        )
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_column('Show', 'counted_upcoming')
@@ -0,0 +1,46 @@
+"""search indexes
+
+Revision ID: 7b2d4e6f8a13
+Revises: 3c5e8f2a91d4
+Create Date: 2026-10-18 11:40:07.132950
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2d4e6f8a13'
+down_revision = '3c5e8f2a91d4'
+branch_labels = None
+depends_on = None
+
+# index name suffix -> indexed expression
+SEARCH_COLUMNS = (
+    ('name', 'name'),
+    ('city', 'city'),
+    ('genres', 'fyyur_genres_text(genres)'),
+)
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute(
+        "CREATE OR REPLACE FUNCTION fyyur_genres_text(varchar[]) RETURNS text "
+        "LANGUAGE sql IMMUTABLE AS $$ SELECT array_to_string($1, ' ') $$"
+    )
+    for table in ('Venue', 'Artist'):
+        for suffix, expression in SEARCH_COLUMNS:
+            op.create_index(
+                'ix_{}_{}_trgm'.format(table.lower(), suffix),
+                table, [sa.text(expression)],
+                postgresql_using='gin',
+                postgresql_ops={expression: 'gin_trgm_ops'}
+            )
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        for suffix, _ in SEARCH_COLUMNS:
+            op.drop_index('ix_{}_{}_trgm'.format(table.lower(), suffix), table_name=table)
+    op.execute('DROP FUNCTION IF EXISTS fyyur_genres_text(varchar[])')
@@ -0,0 +1,24 @@
+"""show keyset index
+
+Revision ID: 9e41c07d5b26
+Revises: 7b2d4e6f8a13
+Create Date: 2026-10-18 13:02:55.417306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e41c07d5b26'
+down_revision = '7b2d4e6f8a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_start_time_id', 'Show', ['start_time', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_id', table_name='Show')
@@ -0,0 +1,120 @@
+"""show partitions
+
+Revision ID: a3c7f9d2e4b6
+Revises: f2b7e4a9c6d8
+Create Date: 2026-10-18 22:41:07.503118
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c7f9d2e4b6'
+down_revision = 'f2b7e4a9c6d8'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'id, venue_id, artist_id, start_time, end_time, counted_upcoming'
+# as models.BOOKING_CONSTRAINT
+BOOKING_CONSTRAINT = (
+    'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_{entity}_booking" EXCLUDE USING gist '
+    "(int4range({entity}_id, {entity}_id, '[]') WITH &&, tsrange(start_time, end_time) WITH &&)"
+)
+
+
+def next_month(month):
+    return datetime.datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def show_columns(name, id_default=None):
+    return [
+        sa.Column('id', sa.Integer(), server_default=id_default, autoincrement=False, nullable=False),
+        sa.Column('venue_id', sa.Integer(), sa.ForeignKey('Venue.id', ondelete=None if name == 'Show' else 'CASCADE')),
+        sa.Column('artist_id', sa.Integer(), sa.ForeignKey('Artist.id', ondelete=None if name == 'Show' else 'CASCADE')),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=False),
+        sa.Column('counted_upcoming', sa.Boolean(), server_default='false', nullable=False),
+    ]
+
+
+def upgrade():
+    # every show is copied and indexed again
+    op.execute('SET LOCAL statement_timeout = 0')
+    # the old table is copied into a partitioned one; the names its
+    # indexes hold are freed first
+    op.execute('ALTER TABLE "Show" RENAME TO "ShowUnpartitioned"')
+    op.execute('ALTER TABLE "ShowUnpartitioned" RENAME CONSTRAINT "Show_pkey" TO "ShowUnpartitioned_pkey"')
+    op.execute('ALTER TABLE "ShowUnpartitioned" ALTER COLUMN id DROP DEFAULT')
+    for index in ('ix_show_start_time_id', 'ix_show_venue_id_start_time', 'ix_show_artist_id_start_time'):
+        op.drop_index(index, table_name='ShowUnpartitioned')
+
+    op.create_table(
+        'Show', *show_columns('Show', sa.text('nextval(\'"Show_id_seq"\'::regclass)')),
+        sa.PrimaryKeyConstraint('id', 'start_time', name='Show_pkey'),
+        sa.CheckConstraint('end_time > start_time', name='ck_show_end_after_start'),
+        postgresql_partition_by='RANGE (start_time)'
+    )
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY "Show".id')
+    op.create_index('ix_show_start_time_id', 'Show', ['start_time', 'id'])
+    op.create_index('ix_show_venue_id_start_time', 'Show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'Show', ['artist_id', 'start_time'])
+
+    # a partition per month of the existing shows; `flask partition-shows`
+    # adds the coming months and archives the old ones
+    partitions = ['Show_default']
+    op.execute('CREATE TABLE "Show_default" PARTITION OF "Show" DEFAULT')
+    first, last = op.get_bind().execute(sa.text('SELECT min(start_time), max(start_time) FROM "ShowUnpartitioned"')).one()
+    if first is not None:
+        month = datetime.datetime(first.year, first.month, 1)
+        while month <= last:
+            partitions.append('Show_y{:04d}m{:02d}'.format(month.year, month.month))
+            op.execute("CREATE TABLE \"{}\" PARTITION OF \"Show\" FOR VALUES FROM ('{}') TO ('{}')".format(
+                partitions[-1], month, next_month(month)))
+            month = next_month(month)
+    op.execute('INSERT INTO "Show" ({0}) SELECT {0} FROM "ShowUnpartitioned"'.format(COLUMNS))
+    # built once the rows are in
+    for partition in partitions:
+        for entity in ('venue', 'artist'):
+            op.execute(BOOKING_CONSTRAINT.format(table=partition, entity=entity))
+    op.drop_table('ShowUnpartitioned')
+
+    op.create_table(
+        'ShowArchive', *show_columns('ShowArchive'),
+        sa.PrimaryKeyConstraint('id', 'start_time'),
+        postgresql_partition_by='RANGE (start_time)'
+    )
+    op.create_index('ix_show_archive_venue_id_start_time', 'ShowArchive', ['venue_id', 'start_time'])
+    op.create_index('ix_show_archive_artist_id_start_time', 'ShowArchive', ['artist_id', 'start_time'])
+
+
+def downgrade():
+    # archived shows come back; run `flask recount-shows` afterwards
+    op.execute('SET LOCAL statement_timeout = 0')
+    op.execute('ALTER TABLE "Show" RENAME TO "ShowPartitioned"')
+    op.execute('ALTER TABLE "ShowPartitioned" RENAME CONSTRAINT "Show_pkey" TO "ShowPartitioned_pkey"')
+    op.execute('ALTER TABLE "ShowPartitioned" ALTER COLUMN id DROP DEFAULT')
+    for index in ('ix_show_start_time_id', 'ix_show_venue_id_start_time', 'ix_show_artist_id_start_time'):
+        op.drop_index(index, table_name='ShowPartitioned')
+
+    op.create_table(
+        'Show', *show_columns('Show', sa.text('nextval(\'"Show_id_seq"\'::regclass)')),
+        sa.PrimaryKeyConstraint('id', name='Show_pkey'),
+        sa.CheckConstraint('end_time > start_time', name='ck_show_end_after_start')
+    )
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY "Show".id')
+    for source in ('ShowPartitioned', 'ShowArchive'):
+        op.execute('INSERT INTO "Show" ({0}) SELECT {0} FROM "{1}"'.format(COLUMNS, source))
+    op.drop_table('ShowArchive')
+    op.drop_table('ShowPartitioned')
+    op.create_index('ix_show_start_time_id', 'Show', ['start_time', 'id'])
+    op.create_index('ix_show_venue_id_start_time', 'Show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'Show', ['artist_id', 'start_time'])
+    for column in ('venue_id', 'artist_id'):
+        op.execute(
+            'ALTER TABLE "Show" ADD CONSTRAINT ex_show_{}_booking EXCLUDE USING gist '
+            "(int4range({column}, {column}, '[]') WITH &&, tsrange(start_time, end_time) WITH &&)".format(
+                column.split('_')[0], column=column)
+        )
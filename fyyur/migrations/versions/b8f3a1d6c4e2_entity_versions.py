@@ -0,0 +1,26 @@
+"""entity versions
+
+Revision ID: b8f3a1d6c4e2
+Revises: 9e41c07d5b26
+Create Date: 2026-10-18 14:21:38.904116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8f3a1d6c4e2'
+down_revision = '9e41c07d5b26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('Artist', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    op.drop_column('Artist', 'version')
+    op.drop_column('Venue', 'version')
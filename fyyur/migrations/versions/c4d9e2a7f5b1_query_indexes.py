@@ -0,0 +1,34 @@
+"""query indexes
+
+Revision ID: c4d9e2a7f5b1
+Revises: b8f3a1d6c4e2
+Create Date: 2026-10-18 14:21:37.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d9e2a7f5b1'
+down_revision = 'b8f3a1d6c4e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'Show', ['venue_id', 'start_time'])
+    op.create_index('ix_show_artist_id_start_time', 'Show', ['artist_id', 'start_time'])
+    op.create_index('ix_venue_state_city_id', 'Venue', ['state', 'city', 'id'])
+    op.create_index('ix_artist_name_id', 'Artist', ['name', 'id'])
+    op.create_index('ix_venue_genres', 'Venue', ['genres'], postgresql_using='gin')
+    op.create_index('ix_artist_genres', 'Artist', ['genres'], postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_artist_genres', table_name='Artist')
+    op.drop_index('ix_venue_genres', table_name='Venue')
+    op.drop_index('ix_artist_name_id', table_name='Artist')
+    op.drop_index('ix_venue_state_city_id', table_name='Venue')
+    op.drop_index('ix_show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='Show')
@@ -0,0 +1,48 @@
+"""catalog generation
+
+Revision ID: c6e1d8a4f2b9
+Revises: a3c7f9d2e4b6
+Create Date: 2026-10-18 23:52:14.276093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e1d8a4f2b9'
+down_revision = 'a3c7f9d2e4b6'
+branch_labels = None
+depends_on = None
+
+# as models.GENERATION_SLOTS
+GENERATION_SLOTS = 8
+
+
+def upgrade():
+    op.create_table(
+        'CatalogGeneration',
+        sa.Column('table_name', sa.String(length=20), nullable=False),
+        sa.Column('slot', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('generation', sa.BigInteger(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('table_name', 'slot')
+    )
+    op.execute(
+        "CREATE OR REPLACE FUNCTION fyyur_bump_generation() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+        "INSERT INTO \"CatalogGeneration\" (table_name, slot, generation) "
+        "VALUES (TG_TABLE_NAME, pg_backend_pid() % {}, 1) "
+        "ON CONFLICT (table_name, slot) DO UPDATE SET generation = \"CatalogGeneration\".generation + 1; "
+        "RETURN NULL; END $$".format(GENERATION_SLOTS)
+    )
+    for table in ('Venue', 'Artist'):
+        op.execute(
+            'CREATE TRIGGER "{0}_generation" AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE '
+            'ON "{0}" FOR EACH STATEMENT EXECUTE FUNCTION fyyur_bump_generation()'.format(table)
+        )
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.execute('DROP TRIGGER "{0}_generation" ON "{0}"'.format(table))
+    op.execute('DROP FUNCTION fyyur_bump_generation()')
+    op.drop_table('CatalogGeneration')
@@ -0,0 +1,38 @@
+"""show bookings
+
+Revision ID: d1f6b3c8e9a2
+Revises: c4d9e2a7f5b1
+Create Date: 2026-10-18 15:08:44.219537
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f6b3c8e9a2'
+down_revision = 'c4d9e2a7f5b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # existing shows get the default length (models.SHOW_DURATION)
+    op.execute("UPDATE \"Show\" SET end_time = start_time + interval '3 hours'")
+    op.alter_column('Show', 'end_time', nullable=False)
+    op.create_check_constraint('ck_show_end_after_start', 'Show', 'end_time > start_time')
+    # fails if the table already holds double bookings; resolve those first
+    for column in ('venue_id', 'artist_id'):
+        op.execute(
+            'ALTER TABLE "Show" ADD CONSTRAINT ex_show_{}_booking EXCLUDE USING gist '
+            "(int4range({column}, {column}, '[]') WITH &&, tsrange(start_time, end_time) WITH &&)".format(
+                column.split('_')[0], column=column)
+        )
+
+
+def downgrade():
+    op.drop_constraint('ex_show_artist_booking', 'Show')
+    op.drop_constraint('ex_show_venue_booking', 'Show')
+    op.drop_constraint('ck_show_end_after_start', 'Show')
+    op.drop_column('Show', 'end_time')
@@ -0,0 +1,30 @@
+"""venue locations
+
+Revision ID: e5a8c2f1b7d3
+Revises: d1f6b3c8e9a2
+Create Date: 2026-10-18 19:02:11.480236
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a8c2f1b7d3'
+down_revision = 'd1f6b3c8e9a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing venues are placed with `flask geocode-venues`
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.create_index('ix_venue_location', 'Venue', [sa.text('point(longitude, latitude)')],
+                    postgresql_using='gist')
+
+
+def downgrade():
+    op.drop_index('ix_venue_location', table_name='Venue')
+    op.drop_column('Venue', 'longitude')
+    op.drop_column('Venue', 'latitude')
@@ -0,0 +1,31 @@
+"""artist letter index
+
+Revision ID: f2b7e4a9c6d8
+Revises: e5a8c2f1b7d3
+Create Date: 2026-10-18 20:11:45.917302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b7e4a9c6d8'
+down_revision = 'e5a8c2f1b7d3'
+branch_labels = None
+depends_on = None
+
+ARTIST_LETTER = ("(CASE WHEN (upper(substr(name, 1, 1)) BETWEEN 'A' AND 'Z') "
+                 "THEN upper(substr(name, 1, 1)) ELSE '#' END)")
+
+
+def upgrade():
+    # the A-Z listing and its counts; it also serves the full listing,
+    # so the plain name index goes
+    op.create_index('ix_artist_letter_name_id', 'Artist', [sa.text(ARTIST_LETTER), 'name', 'id'])
+    op.drop_index('ix_artist_name_id', table_name='Artist')
+
+
+def downgrade():
+    op.create_index('ix_artist_name_id', 'Artist', ['name', 'id'])
+    op.drop_index('ix_artist_letter_name_id', table_name='Artist')
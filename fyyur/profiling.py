@@ -0,0 +1,112 @@
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMS = re.compile(r"%\(\w+\)s|%s|\?")
+_PARAM_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(statement):
+    # the shape of a statement: literals and bound parameters become '?'
+    # and IN lists collapse, so the same query with other values matches
+    shape = _PARAMS.sub('?', _LITERALS.sub('?', statement))
+    shape = _PARAM_LISTS.sub('(?)', shape)
+    return _SPACES.sub(' ', shape).strip()
+
+
+class RequestProfile(object):
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold):
+        return [(shape, count) for shape, count in self.statements.most_common()
+                if count > threshold]
+
+    def as_dict(self, threshold):
+        return {
+            'method': self.method,
+            'path': self.path,
+            'queries': self.queries,
+            'db_time_ms': round(self.db_time * 1000, 3),
+            'repeated': [{'statement': shape, 'count': count}
+                         for shape, count in self.repeated(threshold)],
+        }
+
+
+class SQLProfiler(object):
+    """Opt-in per-request SQL statistics.
+
+    While ``SQL_PROFILING`` is on, every statement run on the engine
+    during a request is counted and timed, and its shape recorded. The
+    totals are sent back in ``X-DB-*`` response headers, kept in a ring
+    buffer of recent requests, and a warning is logged for every shape
+    run more than ``SQL_PROFILING_REPEAT_THRESHOLD`` times in the same
+    request (the usual N+1 pattern). Queries run while a streamed
+    response is being sent happen after the headers are out, so they
+    are not counted.
+    """
+
+    def __init__(self, app=None, engine=None):
+        self.history = deque()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, engine)
+
+    def init_app(self, app, engine):
+        self.app = app
+        self.history = deque(maxlen=app.config['SQL_PROFILING_HISTORY'])
+        self.watch(engine)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def watch(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def recent(self):
+        with self._lock:
+            return list(self.history)
+
+    def _before_request(self):
+        if self.app.config['SQL_PROFILING']:
+            g.sql_profile = RequestProfile(request.method, request.full_path.rstrip('?'))
+
+    def _after_request(self, response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        threshold = self.app.config['SQL_PROFILING_REPEAT_THRESHOLD']
+        for shape, count in profile.repeated(threshold):
+            self.app.logger.warning('%s %s ran the same statement %d times: %s',
+                                    profile.method, profile.path, count, shape)
+        response.headers['X-DB-Query-Count'] = str(profile.queries)
+        response.headers['X-DB-Time'] = '{:.3f}'.format(profile.db_time * 1000)
+        with self._lock:
+            self.history.append(profile.as_dict(threshold))
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # kept on the statement's execution context, which goes away with
+        # it whether or not the statement succeeds
+        if has_request_context() and 'sql_profile' in g:
+            context._sql_profile_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_sql_profile_started', None)
+        if started is None or not (has_request_context() and 'sql_profile' in g):
+            return
+        profile = g.sql_profile
+        profile.db_time += time.perf_counter() - started
+        profile.queries += 1
+        profile.statements[fingerprint(statement)] += 1
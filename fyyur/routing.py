@@ -0,0 +1,63 @@
+"""Sends the reads of read-only pages to replica databases.
+
+Requests to an endpoint matching ``REPLICA_ENDPOINTS`` run their
+queries on one of the ``SQLALCHEMY_REPLICA_URIS``, picked per request;
+everything else, and every flush or DML statement, goes to the primary.
+A client that has just submitted a form reads from the primary for
+``REPLICA_STICKY_SECONDS`` afterwards, so it sees its own writes while
+the replicas catch up.
+"""
+import random
+from fnmatch import fnmatch
+
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+
+STICKY_COOKIE = 'fyyur_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_bind_key(index):
+    return 'replica_{}'.format(index)
+
+
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, 'is_dml', False):
+            replica = g.get('replica') if has_app_context() else None
+            if replica is not None:
+                return replica
+        return super(RoutingSession, self).get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter(object):
+
+    def __init__(self, app=None, db=None):
+        self.engines = []
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.app = app
+        self.engines = [db.engines[replica_bind_key(i)]
+                        for i in range(len(app.config['SQLALCHEMY_REPLICA_URIS']))]
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def is_read_only(self, endpoint):
+        return endpoint is not None and any(
+            fnmatch(endpoint, pattern) for pattern in self.app.config['REPLICA_ENDPOINTS'])
+
+    def _before_request(self):
+        g.replica = None
+        if (self.engines and self.is_read_only(request.endpoint)
+                and STICKY_COOKIE not in request.cookies):
+            g.replica = random.choice(self.engines)
+
+    def _after_request(self, response):
+        if (self.engines and request.method not in SAFE_METHODS
+                and not self.is_read_only(request.endpoint)):
+            response.set_cookie(STICKY_COOKIE, '1', max_age=self.app.config['REPLICA_STICKY_SECONDS'],
+                                httponly=True, samesite='Lax')
+        return response
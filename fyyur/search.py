@@ -0,0 +1,432 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from flask import current_app
+from sqlalchemy import case, func, or_
+
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Ranking.
+#----------------------------------------------------------------------------#
+
+# how much a match in each field counts towards the rank
+FIELD_WEIGHTS = {
+    'name': 1.0,
+    'city': 0.5,
+    'genres': 0.25,
+}
+SEARCH_LIMIT = 50
+# matches are counted up to this many; past it the count reads "more"
+SEARCH_COUNT_LIMIT = 1000
+# the trigram indexes only serve patterns of three characters or more;
+# shorter terms are looked up as name prefixes instead
+MIN_SQL_TERM = 3
+
+
+def match_quality(text, term):
+    # 1.0 exact, 0.75 prefix, 0.5 word prefix, 0.25 substring, 0 no match
+    # ``text`` and ``term`` are expected in lower case
+    if text == term:
+        return 1.0
+    if text.startswith(term):
+        return 0.75
+    if (' ' + term) in text:
+        return 0.5
+    if term in text:
+        return 0.25
+    return 0.0
+
+
+def highlight_spans(text, term):
+    # (start, end) offsets of every case-insensitive occurrence of term
+    if not text or not term:
+        return []
+    return [(m.start(), m.end()) for m in re.finditer(re.escape(term), text, re.IGNORECASE)]
+
+
+def _result(row, term, upcoming_show_count):
+    genres = ' '.join(row['genres'] or [])
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'city': row['city'],
+        'state': row['state'],
+        'upcoming_show_count': upcoming_show_count,
+        'rank': row['rank'],
+        'highlights': {
+            'name': highlight_spans(row['name'], term),
+            'city': highlight_spans(row['city'], term),
+            'genres': highlight_spans(genres, term),
+        }
+    }
+
+#----------------------------------------------------------------------------#
+# PostgreSQL backend.
+#----------------------------------------------------------------------------#
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _sql_match_quality(column, term):
+    escaped = _escape_like(term)
+    return case(
+        (func.lower(column) == term, 1.0),
+        (column.ilike(escaped + '%', escape='\\'), 0.75),
+        (column.ilike('% ' + escaped + '%', escape='\\'), 0.5),
+        (column.ilike('%' + escaped + '%', escape='\\'), 0.25),
+        else_=0.0
+    )
+
+
+def _search_fields(model):
+    return {
+        'name': model.name,
+        'city': model.city,
+        'genres': func.fyyur_genres_text(model.genres),
+    }
+
+
+def _search_filter(model, term):
+    # the ILIKE filters are served by the trigram GIN indexes on name,
+    # city and fyyur_genres_text(genres), so no sequential scan is needed
+    pattern = '%' + _escape_like(term) + '%'
+    return or_(*(column.ilike(pattern, escape='\\') for column in _search_fields(model).values()))
+
+
+def query_search(model, term, limit=SEARCH_LIMIT):
+    fields = _search_fields(model)
+    rank = sum(_sql_match_quality(fields[f], term) * FIELD_WEIGHTS[f] for f in FIELD_WEIGHTS)
+    return db.session.query(
+        model.id, model.name, model.city, model.state, model.genres,
+        model.upcoming_shows_count,
+        rank.label('rank')
+    ).filter(_search_filter(model, term)).order_by(rank.desc(), model.name, model.id).limit(limit)
+
+
+def query_search_count(model, term, cap=SEARCH_COUNT_LIMIT):
+    # stops after cap + 1 matches, however common the term
+    matches = db.session.query(model.id).filter(_search_filter(model, term)).limit(cap + 1).subquery()
+    return db.session.query(func.count()).select_from(matches)
+
+
+def search_sql(model, term, limit=SEARCH_LIMIT):
+    rows = query_search(model, term, limit).all()
+    # a short page holds every match, so there is nothing left to count
+    total = len(rows) if len(rows) < limit else query_search_count(model, term).scalar()
+    return total, [_result(row._mapping, term, row.upcoming_shows_count) for row in rows]
+
+
+def search_prefix(model, term, limit=SEARCH_LIMIT):
+    # terms too short for the trigram indexes: the names with a word
+    # starting with the term, from the autocomplete index
+    found = get_autocomplete().indexes[model.__name__].complete(term, SEARCH_COUNT_LIMIT + 1)
+    top = heapq.nsmallest(limit, found, key=lambda item: (-match_quality(item[1].lower(), term), item[1], item[0]))
+    rows = db.session.query(
+        model.id, model.name, model.city, model.state, model.genres, model.upcoming_shows_count
+    ).filter(model.id.in_([doc_id for doc_id, _ in top])).all() if top else []
+    results = []
+    for row in rows:
+        fields = {
+            'name': (row.name or '').lower(),
+            'city': (row.city or '').lower(),
+            'genres': ' '.join(row.genres or []).lower(),
+        }
+        rank = sum(match_quality(fields[f], term) * FIELD_WEIGHTS[f] for f in FIELD_WEIGHTS)
+        results.append(_result(dict(row._mapping, rank=rank), term, row.upcoming_shows_count))
+    results.sort(key=lambda result: (-result['rank'], result['name'], result['id']))
+    return len(found), results
+
+#----------------------------------------------------------------------------#
+# In-memory fallback.
+#----------------------------------------------------------------------------#
+
+def trigrams(text):
+    text = ' {} '.format(text)
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+class InvertedIndex(object):
+    """Trigram inverted index over the searchable fields of one model.
+
+    The SEARCH_BACKEND=memory path. Every document is stored lower-cased
+    next to its display row; a query intersects the posting sets of its
+    trigrams and then confirms the substring match on the few candidates
+    left. The index lives in the worker process, so it only sees the
+    writes made through this worker.
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.postings = defaultdict(set)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, row):
+        self.remove(row['id'])
+        fields = {
+            'name': (row['name'] or '').lower(),
+            'city': (row['city'] or '').lower(),
+            'genres': ' '.join(row['genres'] or []).lower(),
+        }
+        self.documents[row['id']] = (fields, row)
+        for text in fields.values():
+            for gram in trigrams(text):
+                self.postings[gram].add(row['id'])
+
+    def remove(self, doc_id):
+        document = self.documents.pop(doc_id, None)
+        if document is None:
+            return
+        for text in document[0].values():
+            for gram in trigrams(text):
+                self.postings[gram].discard(doc_id)
+
+    def candidates(self, term):
+        # trigrams that sit inside the term; padded edges are skipped
+        # because the term may match in the middle of a word
+        grams = [term[i:i + 3] for i in range(len(term) - 2)]
+        if not grams:
+            return self.documents.keys()
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        return set.intersection(*postings)
+
+    def search(self, term, limit=SEARCH_LIMIT):
+        term = term.lower()
+        matches = []
+        for doc_id in self.candidates(term):
+            fields, row = self.documents[doc_id]
+            rank = sum(match_quality(fields[f], term) * FIELD_WEIGHTS[f] for f in FIELD_WEIGHTS)
+            if rank:
+                matches.append((-rank, row['name'] or '', doc_id, row))
+        top = heapq.nsmallest(limit, matches, key=lambda match: match[:3])
+        return len(matches), [dict(row, rank=-rank) for rank, _, _, row in top]
+
+
+_indexes = {}
+
+
+def _index_row(entity):
+    return {
+        'id': entity.id,
+        'name': entity.name,
+        'city': entity.city,
+        'state': entity.state,
+        'genres': entity.genres,
+    }
+
+
+def get_index(model):
+    # built from the table on first use, then kept current by index_entity()
+    index = _indexes.get(model.__name__)
+    if index is None:
+        index = InvertedIndex()
+        for entity in db.session.query(model).yield_per(1000):
+            index.add(_index_row(entity))
+        _indexes[model.__name__] = index
+    return index
+
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#----------------------------------------------------------------------------#
+
+AUTOCOMPLETE_LIMIT = 8
+
+
+def prefix_keys(label):
+    # the lower-cased label and every tail of it that starts a word, so
+    # 'hop' completes 'The Musical Hop'
+    label = label.lower()
+    return [label[match.start():] for match in re.finditer(r'\b\w', label)] or [label]
+
+
+class PrefixIndex(object):
+    """Sorted array of (key, doc id) pairs for prefix completion.
+
+    All the keys starting with a prefix sit next to each other, so a
+    lookup is one bisection plus a walk over at most a few more pairs
+    than it returns. Adding or removing a document moves the tail of
+    the array, which is fine at the rate venues and artists change.
+    """
+
+    def __init__(self):
+        self.pairs = []
+        self.labels = {}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def add(self, doc_id, label):
+        self.remove(doc_id)
+        if not label:
+            return
+        self.labels[doc_id] = label
+        for key in prefix_keys(label):
+            insort(self.pairs, (key, doc_id))
+
+    def update(self, items):
+        # bulk add of new (doc id, label) items with a single sort
+        for doc_id, label in items:
+            if label and doc_id not in self.labels:
+                self.labels[doc_id] = label
+                self.pairs.extend((key, doc_id) for key in prefix_keys(label))
+        self.pairs.sort()
+
+    def remove(self, doc_id):
+        label = self.labels.pop(doc_id, None)
+        if label is None:
+            return
+        for key in prefix_keys(label):
+            i = bisect_left(self.pairs, (key, doc_id))
+            if i < len(self.pairs) and self.pairs[i] == (key, doc_id):
+                del self.pairs[i]
+
+    def complete(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        # (doc id, label) of up to ``limit`` documents, by matching key
+        prefix = prefix.lower()
+        pairs = self.pairs
+        found = {}
+        i = bisect_left(pairs, (prefix,))
+        while i < len(pairs) and len(found) < limit and pairs[i][0].startswith(prefix):
+            doc_id = pairs[i][1]
+            found.setdefault(doc_id, self.labels[doc_id])
+            i += 1
+        return list(found.items())
+
+
+class Autocomplete(object):
+    """Venue, artist and city names by prefix, held in the worker.
+
+    Cities are counted over the venues and artists in them and listed
+    while any is left. Like the in-memory search index, it is built from
+    the tables once and then follows the writes of this worker.
+    """
+
+    def __init__(self):
+        self.indexes = {'Venue': PrefixIndex(), 'Artist': PrefixIndex()}
+        self.cities = PrefixIndex()
+        self.city_counts = Counter()
+        self.entity_cities = {}
+
+    def load(self, kind, rows):
+        # the first fill, sorted once rather than row by row
+        rows = list(rows)
+        self.indexes[kind].update((row['id'], row['name']) for row in rows)
+        for row in rows:
+            self._count_city(kind, row)
+
+    def add(self, kind, row):
+        self.remove(kind, row['id'])
+        self.indexes[kind].add(row['id'], row['name'])
+        self._count_city(kind, row)
+
+    def _count_city(self, kind, row):
+        if row['city'] and row['state']:
+            city = (row['city'], row['state'])
+            self.entity_cities[kind, row['id']] = city
+            self.city_counts[city] += 1
+            if self.city_counts[city] == 1:
+                self.cities.add(city, row['city'])
+
+    def remove(self, kind, entity_id):
+        self.indexes[kind].remove(entity_id)
+        city = self.entity_cities.pop((kind, entity_id), None)
+        if city is not None:
+            self.city_counts[city] -= 1
+            if not self.city_counts[city]:
+                del self.city_counts[city]
+                self.cities.remove(city)
+
+    def complete(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        return {
+            'venues': [{'id': doc_id, 'name': name}
+                       for doc_id, name in self.indexes['Venue'].complete(prefix, limit)],
+            'artists': [{'id': doc_id, 'name': name}
+                        for doc_id, name in self.indexes['Artist'].complete(prefix, limit)],
+            'cities': [{'city': city, 'state': state}
+                       for (city, state), _ in self.cities.complete(prefix, limit)],
+        }
+
+
+_autocomplete = None
+
+
+def get_autocomplete():
+    # built from the tables on first use, or at startup
+    global _autocomplete
+    if _autocomplete is None:
+        autocomplete = Autocomplete()
+        for model in (Venue, Artist):
+            rows = db.session.query(model.id, model.name, model.city, model.state).yield_per(10000)
+            autocomplete.load(model.__name__, (row._mapping for row in rows))
+        _autocomplete = autocomplete
+    return _autocomplete
+
+
+def autocomplete(prefix, limit=AUTOCOMPLETE_LIMIT):
+    prefix = (prefix or '').strip()
+    if not prefix:
+        return {'venues': [], 'artists': [], 'cities': []}
+    return get_autocomplete().complete(prefix, limit)
+
+#----------------------------------------------------------------------------#
+# Write hooks.
+#----------------------------------------------------------------------------#
+
+def index_entity(entity):
+    row = _index_row(entity)
+    if type(entity).__name__ in _indexes:
+        _indexes[type(entity).__name__].add(row)
+    if _autocomplete is not None:
+        _autocomplete.add(type(entity).__name__, row)
+
+
+def unindex_entity(model, entity_id):
+    if model.__name__ in _indexes:
+        _indexes[model.__name__].remove(entity_id)
+    if _autocomplete is not None:
+        _autocomplete.remove(model.__name__, entity_id)
+
+
+def reset_indexes():
+    global _autocomplete
+    _indexes.clear()
+    _autocomplete = None
+
+#----------------------------------------------------------------------------#
+# Entry point.
+#----------------------------------------------------------------------------#
+
+def use_memory_backend():
+    backend = current_app.config.get('SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        return db.engine.dialect.name != 'postgresql'
+    return backend == 'memory'
+
+
+def search(model, term, limit=SEARCH_LIMIT):
+    """Ranked search over name, city and genres.
+
+    Returns ``{'count': matches, 'more': bool, 'data': top results}``
+    where each result carries its rank and the highlight spans per
+    field. Matches are counted up to SEARCH_COUNT_LIMIT; ``more`` tells
+    there are others. With the SQL backend, terms shorter than
+    MIN_SQL_TERM only match the start of a word of the name. Callers
+    send a blank term to the listing instead.
+    """
+    term = (term or '').strip()
+    if use_memory_backend():
+        count, rows = get_index(model).search(term, limit)
+        # the counters change with every show, so read them fresh
+        counters = dict(db.session.query(model.id, model.upcoming_shows_count).filter(
+            model.id.in_([row['id'] for row in rows])).all()) if rows else {}
+        data = [_result(row, term, counters.get(row['id'], 0)) for row in rows]
+    elif len(term) < MIN_SQL_TERM:
+        count, data = search_prefix(model, term.lower(), limit)
+    else:
+        count, data = search_sql(model, term.lower(), limit)
+    return {'count': min(count, SEARCH_COUNT_LIMIT), 'more': count > SEARCH_COUNT_LIMIT, 'data': data}
@@ -0,0 +1,1257 @@
+import gzip
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+
+import babel.dates
+from flask import Flask
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+# point the app at a throw-away database before create_app() builds the
+# engine; its tables only exist while a test runs
+os.environ['AUTOCOMPLETE_WARM'] = '0'
+os.environ['DATABASE_URL'] = os.environ.get(
+    'TEST_DATABASE_URL',
+    "postgresql://{}:{}@{}/{}".format('postgres', '1234', 'localhost:5432', 'fyyur_test')
+)
+
+from app import create_app
+from extensions import fragment_cache, facet_cache, sql_profiler, replica_router, assets
+from filters import format_datetime
+from views import cached_genre_facets
+from applog import JSONFormatter, SampleFilter, route_logs
+from cache import FragmentCache
+from models import db, get_venue_areas, get_show_dicts, get_show_page, rollover_shows, recount_shows, catalog_generation, Venue, Artist, Show
+from models import query_show_page, query_venue_areas, query_entity_shows
+from models import query_artist_letters, query_artist_page, get_artist_letters, get_artist_page
+from models import booking_key, booking_period, find_booking_conflicts, SHOW_DURATION
+from models import bounding_boxes, query_venues_within, venues_near
+from models import partition_shows, list_partitions, partition_name, month_start, DEFAULT_PARTITION, ShowArchive
+from importer import BookingCalendar
+from datagen import Dataset, load_dataset, read_cities
+from loadtest import READ_ROUTES, WRITE_ROUTES
+from exports import chunked, ics_line
+from assets import build_assets, rewrite_css_urls
+from search import search, query_search, reset_indexes, InvertedIndex, PrefixIndex, get_autocomplete
+from profiling import fingerprint
+from benchmark import seed_dataset
+
+app = create_app()
+
+
+class QueryCounter(object):
+    """Counts the statements sent to the engine inside a with block"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+def plan_nodes(query):
+    """Every node of the plan of ``query``, outermost first.
+
+    Sequential scans are disabled for the transaction first, so the
+    planner only falls back to one when no index fits.
+    """
+    connection = db.session.connection()
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    compiled = query.statement.compile(dialect=connection.dialect)
+    plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params).scalar()
+    nodes, pending = [], [plan[0]['Plan']]
+    while pending:
+        node = pending.pop(0)
+        nodes.append(node)
+        pending.extend(node.get('Plans', []))
+    return nodes
+
+
+def full_scans(nodes):
+    # tables read from end to end (in any of their partitions): a
+    # sequential scan, or an index scan without an index condition
+    return sorted(set(re.sub(r'_(y\d{4}m\d{2}|default)$', '', node['Relation Name']) for node in nodes
+                      if node['Node Type'] in ('Seq Scan', 'Index Scan', 'Index Only Scan')
+                      and 'Index Cond' not in node))
+
+
+class FyyurTestCase(unittest.TestCase):
+    """This class represents the fyyur test case"""
+
+    def setUp(self):
+        """Define test variables and seed a small dataset."""
+        self.app = app
+        self.client = self.app.test_client
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        fragment_cache.clear()
+        facet_cache.clear()
+        db.drop_all()
+        db.create_all()
+        self.now = datetime.now()
+        self.seed()
+
+    def tearDown(self):
+        """Executed after reach test"""
+        db.session.remove()
+        db.drop_all()
+        self.app.config['SEARCH_BACKEND'] = 'auto'
+        self.app.config['STREAM_TEMPLATES'] = False
+        self.app.config['SQL_PROFILING'] = False
+        sql_profiler.history.clear()
+        reset_indexes()
+        self.ctx.pop()
+
+    def seed(self, venues_per_area=3, shows_per_venue=4):
+        areas = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX')]
+        self.artist = Artist(name='Guns N Petals', city='San Francisco', state='CA',
+                             genres=['Rock n Roll'])
+        db.session.add(self.artist)
+        for a, (city, state) in enumerate(areas):
+            for i in range(venues_per_area):
+                venue = Venue(name='{} Hall {}'.format(city, i), city=city, state=state,
+                              genres=['Jazz'])
+                db.session.add(venue)
+                for j in range(shows_per_venue):
+                    # half of the shows are in the past, half upcoming; the
+                    # artist plays one half-hour set per venue in turn
+                    offset = timedelta(days=j + 1, minutes=30 * (a * venues_per_area + i))
+                    start_time = self.now + offset if j % 2 else self.now - offset
+                    db.session.add(Show(Venue=venue, Artist=self.artist, start_time=start_time,
+                                        end_time=start_time + timedelta(minutes=30)))
+        db.session.commit()
+
+    def test_get_venue_areas(self):
+        """Test for the /venues listing
+        Tests that every area is returned with its venues and
+        the number of upcoming shows per venue
+        """
+        response = self.client().get('/venues')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Austin, TX', response.data)
+        self.assertIn(b'New York Hall 2', response.data)
+
+        areas = get_venue_areas()
+        self.assertEqual([(area['state'], area['city']) for area in areas],
+                         [('CA', 'San Francisco'), ('NY', 'New York'), ('TX', 'Austin')])
+        self.assertEqual(len(areas[0]['venues']), 3)
+        self.assertEqual(areas[0]['venues'][0]['num_upcoming_shows'], 2)
+
+    def test_get_venue_areas_query_count(self):
+        """Test that the /venues listing costs a fixed number of queries
+        no matter how many areas, venues and shows there are
+        """
+        with QueryCounter(db.engine) as small:
+            self.client().get('/venues')
+        self.seed(venues_per_area=20, shows_per_venue=10)
+        with QueryCounter(db.engine) as large:
+            self.client().get('/venues')
+
+        self.assertEqual(small.count, 1)
+        self.assertEqual(large.count, small.count)
+
+    def test_get_venue_detail(self):
+        """Test for the venue detail page
+        Tests that shows are split into upcoming and past and carry
+        the joined artist columns
+        """
+        venue = Venue.query.first()
+        data = venue.get_data_dict()
+
+        self.assertEqual(data['upcoming_shows_count'], 2)
+        self.assertEqual(data['past_shows_count'], 2)
+        self.assertEqual(data['upcoming_shows'][0]['artist_name'], 'Guns N Petals')
+
+        response = self.client().get('/venues/{}'.format(venue.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'2 Upcoming Shows', response.data)
+
+    def test_get_detail_pages_query_count(self):
+        """Test that venue and artist detail pages cost a fixed number
+        of queries no matter how many shows they have
+        """
+        venue = Venue.query.first()
+        path_venue = '/venues/{}'.format(venue.id)
+        path_artist = '/artists/{}'.format(self.artist.id)
+        db.session.remove()
+        with QueryCounter(db.engine) as small_venue:
+            self.client().get(path_venue)
+        with QueryCounter(db.engine) as small_artist:
+            self.client().get(path_artist)
+        venue_id, artist_id = venue.id, self.artist.id
+        for i in range(30):
+            db.session.add(Show(venue_id=venue_id, artist_id=artist_id,
+                                start_time=self.now + timedelta(days=i - 15, hours=12)))
+        db.session.commit()
+        db.session.remove()
+        with QueryCounter(db.engine) as large_venue:
+            self.client().get(path_venue)
+        with QueryCounter(db.engine) as large_artist:
+            self.client().get(path_artist)
+
+        self.assertEqual(small_venue.count, 2)
+        self.assertEqual(large_venue.count, small_venue.count)
+        self.assertEqual(small_artist.count, 2)
+        self.assertEqual(large_artist.count, small_artist.count)
+
+    def test_show_counters_follow_create(self):
+        """Test that creating a show through the form bumps the
+        upcoming counters of its venue and artist
+        """
+        venue = Venue.query.first()
+        venue_id, artist_id = venue.id, self.artist.id
+        response = self.client().post('/shows/create', data={
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': (self.now + timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S'),
+        })
+        db.session.expire_all()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Venue.query.get(venue_id).upcoming_shows_count, 3)
+        self.assertEqual(Venue.query.get(venue_id).past_shows_count, 2)
+        self.assertEqual(Artist.query.get(artist_id).upcoming_shows_count, 19)
+
+    def test_show_counters_follow_delete(self):
+        """Test that deleting a show takes it out of the counters"""
+        show = Show.query.filter(Show.start_time < self.now).first()
+        venue_id = show.venue_id
+        db.session.delete(show)
+        db.session.commit()
+
+        self.assertEqual(Venue.query.get(venue_id).past_shows_count, 1)
+        self.assertEqual(self.artist.past_shows_count, 17)
+
+    def test_delete_entities(self):
+        """Test that deleting a venue or artist takes its shows with it
+        in a fixed number of queries and moves the counters on the other side
+        """
+        venue = Venue.query.first()
+        venue_id, artist_id = venue.id, self.artist.id
+        version = self.artist.version
+        self.client().get('/artists/{}'.format(artist_id))
+        generation = catalog_generation['Venue']
+        db.session.remove()
+        with QueryCounter(db.engine) as queries:
+            response = self.client().delete('/venues/{}'.format(venue_id))
+
+        self.assertEqual(response.get_json(), {'success': True})
+        self.assertEqual(queries.count, 4)
+        self.assertIsNone(Venue.query.get(venue_id))
+        self.assertEqual(Show.query.filter_by(venue_id=venue_id).count(), 0)
+        artist = Artist.query.get(artist_id)
+        self.assertEqual((artist.upcoming_shows_count, artist.past_shows_count), (16, 16))
+        self.assertEqual(artist.version, version + 1)
+        self.assertEqual(catalog_generation['Venue'], generation + 1)
+        self.assertEqual(len(fragment_cache), 0)
+        self.assertNotIn(b'San Francisco Hall 0', self.client().get('/artists/{}'.format(artist_id)).data)
+        self.assertEqual(self.client().get('/autocomplete?q=san+francisco+hall+0').get_json()['venues'], [])
+        self.assertEqual(self.client().delete('/venues/{}'.format(venue_id)).status_code, 404)
+
+        db.session.remove()
+        self.assertEqual(self.client().delete('/artists/{}'.format(artist_id)).status_code, 200)
+        self.assertEqual(Show.query.count(), 0)
+        self.assertEqual(set(venue.upcoming_shows_count + venue.past_shows_count
+                             for venue in Venue.query), {0})
+        self.assertEqual(self.client().delete('/artists/{}'.format(artist_id)).status_code, 404)
+
+    def test_rollover_shows(self):
+        """Test that the rollover moves started shows from the
+        upcoming to the past counters exactly once
+        """
+        later = self.now + timedelta(days=2, hours=5)
+        moved = rollover_shows(now=later)
+        moved_again = rollover_shows(now=later)
+
+        self.assertEqual(moved, 9)
+        self.assertEqual(moved_again, 0)
+        self.assertEqual(self.artist.upcoming_shows_count, 9)
+        self.assertEqual(self.artist.past_shows_count, 27)
+        self.assertEqual(Venue.query.first().upcoming_shows_count, 1)
+
+    def test_recount_shows(self):
+        """Test that the counters can be rebuilt from the Show table"""
+        db.session.execute(Venue.__table__.update().values(upcoming_shows_count=0))
+        recount_shows()
+
+        self.assertEqual([venue.upcoming_shows_count for venue in Venue.query.all()], [2] * 9)
+        self.assertEqual(self.artist.past_shows_count, 18)
+
+    def test_search_reads_counters(self):
+        """Test that search results read the counters without
+        touching the Show table
+        """
+        with QueryCounter(db.engine) as queries:
+            response = self.client().post('/venues/search', data={'search_term': 'austin'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<mark>Austin</mark> Hall 0', response.data)
+        self.assertFalse([s for s in queries.statements if '"Show"' in s])
+
+    def test_search_ranks_and_highlights(self):
+        """Test that search ranks name matches above city matches
+        and returns the highlight spans
+        """
+        db.session.add(Venue(name='Austin Music Hall', city='Dallas', state='TX', genres=['Folk']))
+        db.session.add(Venue(name='Music Hall', city='Austin', state='TX', genres=['Folk']))
+        db.session.commit()
+        for backend in ('postgres', 'memory'):
+            self.app.config['SEARCH_BACKEND'] = backend
+            results = search(Venue, 'AUSTIN')
+            names = [venue['name'] for venue in results['data']]
+
+            self.assertEqual(results['count'], 5)
+            self.assertEqual(names, ['Austin Hall 0', 'Austin Hall 1', 'Austin Hall 2',
+                                     'Austin Music Hall', 'Music Hall'])
+            self.assertEqual(results['data'][0]['highlights']['name'], [(0, 6)])
+            self.assertEqual(results['data'][0]['upcoming_show_count'], 2)
+            self.assertEqual(results['data'][4]['highlights'], {'name': [], 'city': [(0, 6)], 'genres': []})
+
+    def test_search_genres_and_partial_terms(self):
+        """Test that search matches genres and partial, case-insensitive terms"""
+        for backend in ('postgres', 'memory'):
+            self.app.config['SEARCH_BACKEND'] = backend
+
+            self.assertEqual(search(Artist, 'n roll')['count'], 1)
+            self.assertEqual(search(Venue, 'hall 1')['count'], 3)
+            self.assertEqual(search(Venue, 'jaz')['count'], 9)
+            self.assertEqual(search(Venue, '100%')['count'], 0)
+
+    def test_search_short_terms_and_counts(self):
+        """Test that terms too short for the trigram indexes match word
+        prefixes of names, and that counts stop at SEARCH_COUNT_LIMIT
+        """
+        results = search(Venue, 'Au')
+        self.assertEqual(results['count'], 3)
+        self.assertEqual([venue['name'] for venue in results['data']],
+                         ['Austin Hall 0', 'Austin Hall 1', 'Austin Hall 2'])
+        self.assertEqual(results['data'][0]['highlights']['name'], [(0, 2)])
+        self.assertEqual(results['data'][0]['upcoming_show_count'], 2)
+        self.assertEqual(search(Venue, 'ja')['count'], 0)
+        self.assertEqual(search(Venue, 'h')['count'], 9)
+
+        with mock.patch('search.SEARCH_COUNT_LIMIT', 4):
+            self.assertEqual(search(Venue, 'hall', limit=2), {'count': 4, 'more': True, 'data': mock.ANY})
+            self.assertEqual(search(Venue, 'austin', limit=2)['count'], 3)
+            self.assertFalse(search(Venue, 'austin', limit=2)['more'])
+            self.assertEqual(search(Venue, 'ha')['count'], 4)
+
+    def test_blank_search_lists_everything(self):
+        """Test that a blank search goes to the full listing"""
+        for kind in ('venues', 'artists'):
+            res = self.client().post('/{}/search'.format(kind), data={'search_term': '  '})
+            self.assertEqual((res.status_code, res.location), (303, '/{}'.format(kind)))
+            res = self.client().get('/api/v1/{}/search?q='.format(kind))
+            self.assertEqual((res.status_code, res.location), (302, '/api/v1/{}'.format(kind)))
+        self.assertIn(b'New York Hall 2', self.client().post(
+            '/venues/search', data={'search_term': ''}, follow_redirects=True).data)
+
+    def test_search_memory_index_follows_writes(self):
+        """Test that the in-memory index picks up created venues"""
+        self.app.config['SEARCH_BACKEND'] = 'memory'
+        self.assertEqual(search(Venue, 'musical hop')['count'], 0)
+        self.client().post('/venues/create', data={
+            'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+            'genres': ['Jazz'], 'address': '1015 Folsom Street',
+        })
+
+        response = self.client().post('/venues/search', data={'search_term': 'Hop'})
+        self.assertIn(b'The Musical <mark>Hop</mark>', response.data)
+
+    def test_inverted_index(self):
+        """Test adding, replacing and removing documents in the inverted index"""
+        index = InvertedIndex()
+        index.add({'id': 1, 'name': 'The Wild Sax Band', 'city': 'San Francisco', 'genres': ['Jazz']})
+        index.add({'id': 2, 'name': 'Matt Quevado', 'city': 'New York', 'genres': ['Jazz']})
+        index.add({'id': 2, 'name': 'Matt Quevedo', 'city': 'New York', 'genres': ['Jazz']})
+
+        self.assertEqual(index.search('band')[0], 1)
+        self.assertEqual(index.search('quevado')[0], 0)
+        self.assertEqual(index.search('jazz')[0], 2)
+        index.remove(1)
+        self.assertEqual(index.search('sax')[0], 0)
+        self.assertEqual(len(index), 1)
+
+    def test_shows_keyset_pages(self):
+        """Test that walking the /shows pages returns every show once,
+        in (start_time, id) order, with one query per page
+        """
+        seen = []
+        after = None
+        while True:
+            with QueryCounter(db.engine) as queries:
+                page, after = get_show_page(after=after, limit=5)
+            self.assertEqual(queries.count, 1)
+            seen.extend(page)
+            if after is None:
+                break
+
+        self.assertEqual(len(seen), 36)
+        self.assertEqual(len(set(show['id'] for show in seen)), 36)
+        self.assertEqual(seen[0]['artist_name'], 'Guns N Petals')
+
+    def test_shows_filters(self):
+        """Test the city, date range and upcoming filters of /shows"""
+        upcoming, _ = get_show_page(limit=100, upcoming_only=True, city='Austin')
+        window, _ = get_show_page(limit=100, date_from=self.now + timedelta(days=1),
+                                  date_to=self.now + timedelta(days=3))
+
+        self.assertEqual(len(upcoming), 6)
+        self.assertEqual(set(show['venue_name'][:6] for show in upcoming), {'Austin'})
+        self.assertEqual(len(window), 9)
+
+    def test_shows_cursor_links(self):
+        """Test that /shows links to the next page and rejects bad cursors"""
+        with mock.patch('views.SHOWS_PER_PAGE', 5):
+            response = self.client().get('/shows?city=Austin')
+        next_url = re.search(rb'href="(/shows\?[^"]+)"', response.data).group(1).decode()
+        second = self.client().get(next_url.replace('&amp;', '&'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('city=Austin', next_url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(self.client().get('/shows?after=bogus').status_code, 400)
+
+    def test_streamed_listings_match_rendered(self):
+        """Test that stream mode sends the same listing pages in chunks"""
+        paths = ('/venues', '/artists', '/shows?city=Austin')
+        rendered = [self.client().get(path).data for path in paths]
+        self.app.config['STREAM_TEMPLATES'] = True
+        for path, body in zip(paths, rendered):
+            response = self.client().get(path)
+
+            self.assertTrue(response.is_streamed)
+            self.assertEqual(response.data, body)
+
+    def test_streamed_shows_next_link(self):
+        """Test that a streamed /shows page links to the next page
+        once the page has been sent
+        """
+        self.app.config['STREAM_TEMPLATES'] = True
+        with mock.patch('views.STREAMED_SHOWS_PER_PAGE', 30):
+            response = self.client().get('/shows')
+
+        self.assertIn(b'More shows', response.data)
+        self.assertEqual(response.data.count(b'tile-show'), 30)
+
+    def test_format_datetime(self):
+        """Test that the datetime filter formats datetime objects the
+        same way babel does, and still accepts strings
+        """
+        value = datetime(2035, 4, 1, 20, 0)
+        full = format_datetime(value, 'full', locale='en_US')
+
+        self.assertEqual(full, 'Sunday April, 1, 2035 at 8:00PM')
+        self.assertEqual(full, babel.dates.format_datetime(
+            value, "EEEE MMMM, d, y 'at' h:mma", locale='en_US'))
+        self.assertEqual(format_datetime('2035-04-01T20:00:00', 'full', locale='en_US'), full)
+        self.assertEqual(format_datetime(value, 'y-MM-dd', locale='en_US'), '2035-04-01')
+        # babel's named formats, other than the two the app overrides
+        for name in ('short', 'long'):
+            with self.subTest(name):
+                self.assertEqual(format_datetime(value, name, locale='en_US'),
+                                 babel.dates.format_datetime(value, name, locale='en_US'))
+        self.assertEqual(format_datetime(value, 'short', locale='de_DE'), '01.04.35, 20:00')
+
+    def test_show_dicts_carry_datetimes(self):
+        """Test that show datetimes reach the templates as datetime objects"""
+        upcoming, past = get_show_dicts(Show.artist_id, self.artist.id)
+        page, _ = get_show_page(limit=1)
+
+        self.assertIsInstance(upcoming[0]['start_time'], datetime)
+        self.assertIsInstance(past[0]['start_time'], datetime)
+        self.assertIsInstance(page[0]['start_time'], datetime)
+
+    def test_detail_fragment_cache(self):
+        """Test that a cached venue page skips the show query and is
+        re-rendered after an edit or a new show
+        """
+        venue = Venue.query.first()
+        venue_id, artist_id = venue.id, self.artist.id
+        path = '/venues/{}'.format(venue_id)
+        first = self.client().get(path)
+        db.session.remove()
+        with QueryCounter(db.engine) as cached:
+            second = self.client().get(path)
+
+        self.assertEqual(cached.count, 1)
+        self.assertEqual(second.data, first.data)
+
+        self.client().post(path + '/edit', data={'name': 'The Dueling Pianos Bar', 'city': 'Austin',
+                                                 'state': 'TX', 'genres': ['Jazz']})
+        self.assertIn(b'The Dueling Pianos Bar', self.client().get(path).data)
+        self.assertIn(b'The Dueling Pianos Bar',
+                      self.client().get('/artists/{}'.format(artist_id)).data)
+
+        self.client().post('/shows/create', data={
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': (self.now + timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S'),
+        })
+        self.assertIn(b'3 Upcoming Shows', self.client().get(path).data)
+
+    def test_fragment_cache_eviction(self):
+        """Test version mismatches, LRU and size eviction and expiry"""
+        cache = FragmentCache(max_entries=2, max_size=10, ttl=60)
+        cache.set(('venue', 1), 1, 'aaaa')
+        cache.set(('venue', 2), 1, 'bbbb')
+        cache.get(('venue', 1), 1)
+        cache.set(('venue', 3), 1, 'cccc')
+
+        self.assertEqual(cache.get(('venue', 1), 1), 'aaaa')
+        self.assertIsNone(cache.get(('venue', 2), 1))
+        self.assertIsNone(cache.get(('venue', 3), 2))
+        self.assertEqual(len(cache), 1)
+
+        cache.set(('venue', 4), 1, 'dddddddd')
+        self.assertEqual(cache.size, 8)
+        self.assertEqual(len(cache), 1)
+
+        cache.set(('venue', 5), 1, 'eeee', expires_at=time.time() - 1)
+        self.assertIsNone(cache.get(('venue', 5), 1))
+
+    def test_import_data(self):
+        """Test the import command validates rows and maps show ids"""
+        tmp = tempfile.mkdtemp()
+        venues = os.path.join(tmp, 'venues.csv')
+        artists = os.path.join(tmp, 'artists.jsonl')
+        shows = os.path.join(tmp, 'shows.csv')
+        with open(venues, 'w') as f:
+            f.write('id,name,city,state,address,phone,genres,website,facebook_link,seeking_talent\n'
+                    'v1,Imported Hall,Austin,TX,1 Main St,512-555-0100,Jazz;Blues,'
+                    'https://hall.example.com,https://facebook.com/hall,yes\n'
+                    'v2,Bad Phone,Austin,TX,2 Main St,5125550100,Jazz,'
+                    'https://bad.example.com,https://facebook.com/bad,no\n')
+        with open(artists, 'w') as f:
+            f.write('{"id": 7, "name": "Imported Band", "city": "Austin", "state": "TX", '
+                    '"phone": "512-555-0101", "genres": ["Folk"], "website": "https://band.example.com", '
+                    '"facebook_link": "https://facebook.com/band", "seeking_venue": false}\n')
+        fmt = '%Y-%m-%d %H:%M:%S'
+        upcoming = self.now + timedelta(days=3)
+        with open(shows, 'w') as f:
+            f.write('venue_id,artist_id,start_time,end_time\n'
+                    'v1,7,{0},\nv1,7,{0},\nv2,7,{0},\nv1,7,not a date,\nv1,7,{1},{2}\n'.format(
+                        upcoming.strftime(fmt), (upcoming + timedelta(hours=3)).strftime(fmt),
+                        (upcoming + timedelta(hours=4)).strftime(fmt)))
+
+        result = self.app.test_cli_runner().invoke(args=[
+            'import-data', '--venues', venues, '--artists', artists,
+            '--shows', shows, '--batch-size', '1'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Venue: 1 imported, 1 rejected', result.output)
+        # the repeated show is a double booking; the next one starts as it ends
+        self.assertIn('Show: 2 imported, 3 rejected', result.output)
+        self.assertIn('Show line 3: venue already booked', result.output)
+
+        db.session.remove()
+        venue = Venue.query.filter_by(name='Imported Hall').one()
+        artist = Artist.query.filter_by(name='Imported Band').one()
+        self.assertEqual(venue.genres, ['Jazz', 'Blues'])
+        self.assertTrue(venue.seeking_talent)
+        self.assertEqual((venue.latitude, venue.longitude), (30.2672, -97.7431))
+        self.assertFalse(artist.seeking_venue)
+        self.assertEqual((venue.upcoming_shows_count, artist.upcoming_shows_count), (2, 2))
+
+    def test_lazy_startup(self):
+        """Test the factory registers every blueprint without loading
+        the modules only some requests and commands need
+        """
+        lazy = ['babel', 'dateutil', 'flask_migrate', 'wtforms', 'importer', 'datagen']
+        script = 'import sys, app; app.create_app(); print(sorted(set(sys.modules) & set({!r})))'.format(lazy)
+        run = subprocess.run([sys.executable, '-W', 'ignore', '-c', script], capture_output=True,
+                             text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(run.returncode, 0, run.stderr)
+        self.assertEqual(run.stdout.strip(), '[]')
+        self.assertEqual(set(self.app.blueprints), {'pages', 'api', 'commands'})
+        self.assertIn('generate-data', self.app.cli.list_commands(None))
+
+    def test_search_form_per_section(self):
+        """Test the venue and artist pages carry the search form of their section"""
+        pages = (
+            self.client().post('/venues/search', data={'search_term': 'hall'}),
+            self.client().get('/venues/{}'.format(Venue.query.first().id)),
+            self.client().post('/artists/search', data={'search_term': 'guns'}),
+            self.client().get('/artists/{}'.format(self.artist.id)),
+        )
+        for res, form, other in zip(pages, ('venues', 'venues', 'artists', 'artists'),
+                                    ('artists', 'artists', 'venues', 'venues')):
+            with self.subTest(res.request.path):
+                self.assertEqual(res.status_code, 200)
+                self.assertIn('action="/{}/search"'.format(form).encode(), res.data)
+                self.assertNotIn('action="/{}/search"'.format(other).encode(), res.data)
+
+    def test_statement_timeout_postgresql_only(self):
+        """Test the statement timeout is only set on PostgreSQL connections"""
+        self.assertIn('statement_timeout', self.app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args']['options'])
+        script = ('import app, models; from sqlalchemy import text; flask_app = app.create_app()\n'
+                  'with flask_app.app_context():\n'
+                  '    models.lift_statement_timeout()\n'
+                  "    print(models.db.session.execute(text('SELECT 1')).scalar())")
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(tmp, 'fyyur.db'))
+            run = subprocess.run([sys.executable, '-W', 'ignore', '-c', script], capture_output=True, text=True,
+                                 env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(run.returncode, 0, run.stderr)
+        self.assertEqual(run.stdout.strip(), '1')
+
+    def test_static_assets(self):
+        """Test built assets get hashed names and are served precompressed,
+        and immutable only under their hashed names
+        """
+        css = b'a { background: url("../fonts/x.woff?v=1#f"); } b { background: url(data:image/png;base64,AA==); }'
+        self.assertEqual(rewrite_css_urls('css/a.css', css, {'fonts/x.woff': 'fonts/x.0123456789ab.woff'}),
+                         b'a { background: url("../fonts/x.0123456789ab.woff?v=1#f"); } '
+                         b'b { background: url(data:image/png;base64,AA==); }')
+
+        tmp = tempfile.mkdtemp()
+        manifest = build_assets(self.app.static_folder, tmp)
+        self.assertRegex(manifest['css/main.css'], r'^css/main\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.isfile(os.path.join(tmp, manifest['js/libs/moment.min.js'] + '.gz')))
+        # already compressed
+        self.assertFalse(os.path.isfile(os.path.join(tmp, manifest['img/front-splash.jpg'] + '.gz')))
+        self.assertEqual(build_assets(self.app.static_folder, tmp), manifest)
+        try:
+            assets.load(tmp)
+            with self.app.test_request_context():
+                url = assets.static_url('js/libs/moment.min.js')
+                self.assertEqual(assets.static_url('css/missing.css'), '/static/css/missing.css')
+            self.assertEqual(url, '/assets/' + manifest['js/libs/moment.min.js'])
+            self.assertIn(url.encode(), self.client().get('/venues').data)
+
+            with open(os.path.join(self.app.static_folder, 'js/libs/moment.min.js'), 'rb') as f:
+                original = f.read()
+            response = self.client().get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content_encoding, 'gzip')
+            self.assertEqual(response.mimetype, 'text/javascript')
+            self.assertIn('Accept-Encoding', response.vary)
+            self.assertTrue(response.cache_control.immutable)
+            self.assertEqual(response.cache_control.max_age, 365 * 24 * 3600)
+            self.assertEqual(gzip.decompress(response.data), original)
+            response.close()
+            response = self.client().get(url)
+            self.assertIsNone(response.content_encoding)
+            self.assertEqual(response.data, original)
+            response.close()
+
+            # names without a content hash are revalidated every time
+            with open(os.path.join(tmp, 'js/unhashed.js'), 'w') as f:
+                f.write('var unhashed = 1;')
+            for path in ('manifest.json', 'js/unhashed.js'):
+                with self.subTest(path):
+                    response = self.client().get('/assets/' + path)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertTrue(response.cache_control.no_cache)
+                    self.assertFalse(response.cache_control.immutable)
+                    self.assertIsNone(response.cache_control.max_age)
+                    response.close()
+
+            # not built: the plain static folder
+            assets.load(os.path.join(tmp, 'missing'))
+            with self.app.test_request_context():
+                self.assertEqual(assets.static_url('css/main.css'), '/static/css/main.css')
+        finally:
+            assets.load(self.app.config['ASSETS_BUILD_DIR'])
+
+    def test_generate_data(self):
+        """Test the generator is deterministic, skewed and loads a consistent dataset"""
+        cities = read_cities(self.app.config['GEOCODE_FILE'])
+        dataset = Dataset(cities, 2000, seed=3, now=self.now)
+        again = Dataset(cities, 2000, seed=3, now=self.now)
+        self.assertEqual((dataset.venues, dataset.artists), (100, 100))
+        self.assertEqual(list(dataset.show_rows()), list(again.show_rows()))
+        self.assertNotEqual(list(dataset.venue_rows()), list(Dataset(cities, 2000, seed=4).venue_rows()))
+        with self.assertRaises(ValueError):
+            Dataset(cities, 20000, venues=10).slot_counts()
+
+        result = self.app.test_cli_runner().invoke(args=['generate-data', '--shows', '2000'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn('already has data', result.output)
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        result = self.app.test_cli_runner().invoke(args=['generate-data', '--shows', '2000', '--seed', '3'])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        db.session.remove()
+        self.assertEqual(Show.query.count(), 2000)
+        counts = sorted((venue.upcoming_shows_count + venue.past_shows_count for venue in Venue.query),
+                        reverse=True)
+        self.assertEqual(sum(counts), 2000)
+        # the busiest tenth of the venues has well over a tenth of the shows
+        self.assertGreater(sum(counts[:10]), 600)
+        self.assertEqual(Venue.query.get(1).upcoming_shows_count + Venue.query.get(1).past_shows_count, counts[0])
+        # the sequences moved past the generated ids
+        self.client().post('/venues/create', data={'name': 'After', 'city': 'Austin', 'state': 'TX'})
+        self.assertEqual(Venue.query.filter_by(name='After').one().id, 101)
+
+    def test_loadtest_routes(self):
+        """Test every route the load test drives answers on generated data"""
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        dataset = Dataset(read_cities(self.app.config['GEOCODE_FILE']), 2000, now=self.now)
+        load_dataset(dataset)
+        rnd = random.Random(0)
+        for route in READ_ROUTES + WRITE_ROUTES:
+            with self.subTest(route=route.name):
+                method, path, form = route.request(rnd, dataset)
+                response = self.client().open(path, method=method, data=form)
+                self.assertLess(response.status_code, 400)
+                endpoint, _ = self.app.url_map.bind('localhost').match(path.split('?')[0], method)
+                self.assertEqual(endpoint, route.name)
+
+    def test_sql_profiling(self):
+        """Test the per-request query headers, history and repeat warnings"""
+        self.assertEqual(self.client().get('/_debug/requests').status_code, 404)
+        self.assertNotIn('X-DB-Query-Count', self.client().get('/venues').headers)
+
+        self.app.config['SQL_PROFILING'] = True
+        res = self.client().get('/venues')
+        self.assertEqual(res.headers['X-DB-Query-Count'], '1')
+        self.assertIn('X-DB-Time', res.headers)
+
+        # an N+1 loop: one lookup per venue within a single request
+        with self.app.test_request_context('/loop'):
+            self.app.preprocess_request()
+            for venue_id in [venue.id for venue in Venue.query.all()]:
+                db.session.get(Venue, venue_id, populate_existing=True)
+            with mock.patch.dict(self.app.config, SQL_PROFILING_REPEAT_THRESHOLD=5), \
+                    self.assertLogs(self.app.logger, 'WARNING') as logs:
+                res = self.app.process_response(self.app.response_class())
+        self.assertEqual(res.headers['X-DB-Query-Count'], '10')
+        self.assertIn('ran the same statement 9 times', logs.output[0])
+
+        history = self.client().get('/_debug/requests').get_json()['requests']
+        self.assertEqual([entry['path'] for entry in history], ['/loop', '/venues'])
+        self.assertEqual(history[0]['repeated'][0]['count'], 9)
+        self.assertEqual(history[1]['repeated'], [])
+
+        # a failed statement leaves nothing behind on its pooled connection
+        with self.app.test_request_context('/fail'):
+            self.app.preprocess_request()
+            info = db.session.connection().info
+            with self.assertRaises(IntegrityError):
+                db.session.execute(text('INSERT INTO "Venue" (id, name) VALUES (:id, :name)'),
+                                   {'id': Venue.query.first().id, 'name': 'x'})
+            db.session.rollback()
+            Venue.query.count()
+            res = self.app.process_response(self.app.response_class())
+        self.assertNotIn('sql_profile_started', info)
+        self.assertEqual(res.headers['X-DB-Query-Count'], '2')
+
+    def test_fingerprint(self):
+        """Test statements differing only in values share a fingerprint"""
+        self.assertEqual(
+            fingerprint('SELECT * FROM "Venue" WHERE id IN (%(id_1_1)s, %(id_1_2)s) AND name = \'x\''),
+            fingerprint('SELECT *  FROM "Venue"\nWHERE id IN (%(id_1_1)s) AND name = \'y y\''))
+        self.assertNotEqual(fingerprint('SELECT 1 FROM "Venue"'), fingerprint('SELECT 1 FROM "Artist"'))
+
+    def test_structured_logging(self):
+        """Test records are written as JSON by the background listener with the request id"""
+        lines = []
+        capture = logging.Handler()
+        capture.setFormatter(JSONFormatter())
+        capture.emit = lambda record: lines.append(capture.format(record))
+        log_listener = self.app.extensions['log_listener']
+        handlers = log_listener.handlers
+        log_listener.handlers = handlers + (capture,)
+        try:
+            res = self.client().post('/shows/create', data={'venue_id': 'x'},
+                                     headers={'X-Request-Id': 'abc123'})
+            log_listener.queue.join()
+        finally:
+            log_listener.handlers = handlers
+        self.assertEqual(res.headers['X-Request-Id'], 'abc123')
+        record = json.loads(lines[-1])
+        self.assertEqual(record['message'], 'show could not be created')
+        self.assertEqual(record['level'], 'ERROR')
+        self.assertEqual(record['request_id'], 'abc123')
+        self.assertIn('Traceback', record['exception'])
+        self.assertEqual(len(self.client().get('/').headers['X-Request-Id']), 32)
+
+    def test_logging_setup_replaces_listener(self):
+        """Test a new app stops the last log listener and does not stack sampling filters"""
+        first = self.app.extensions['log_listener']
+        other = Flask(__name__)
+        other.config.from_object('config')
+        try:
+            second = route_logs(other)
+            self.assertIsNone(first._thread)
+            self.assertIsNotNone(second._thread)
+            samples = [f for f in logging.getLogger('fyyur.models').filters if isinstance(f, SampleFilter)]
+            self.assertEqual(len(samples), 1)
+        finally:
+            self.app.extensions['log_listener'] = route_logs(self.app)
+        self.assertIsNone(second._thread)
+
+    def test_log_sampling(self):
+        """Test sampling drops only a share of the debug records"""
+        sample = SampleFilter(0.0)
+        debug = logging.LogRecord('fyyur.models', logging.DEBUG, '', 0, 'debug', (), None)
+        info = logging.LogRecord('fyyur.models', logging.INFO, '', 0, 'info', (), None)
+        self.assertFalse(sample.filter(debug))
+        self.assertTrue(sample.filter(info))
+        self.assertTrue(SampleFilter(1.0).filter(debug))
+
+        # the sampled hot-path event of fyyur.models
+        venue = Venue.query.first()
+        with mock.patch.object(logging.getLogger('fyyur.models'), 'filters', []), \
+                self.assertLogs('fyyur.models', logging.DEBUG) as logs:
+            venue.get_data_dict()
+        self.assertEqual(logs.records[0].getMessage(), 'loaded entity shows')
+        self.assertEqual((logs.records[0].venue_id, logs.records[0].shows), (venue.id, 4))
+
+    def test_hot_queries_use_indexes(self):
+        """Test every hot query is served by an index (EXPLAIN, no full scans or sorts)"""
+        now = datetime.now()
+        # plans depend on table sizes, so use a dataset shaped like production
+        seed_dataset(db, venues=3000, artists=3000, shows=10000)
+        db.session.execute(text('ANALYZE'))
+        # query -> the tables it is meant to read in full, in index order
+        hot_queries = {
+            'venue detail': (query_entity_shows(Show.venue_id, 1), []),
+            'artist detail': (query_entity_shows(Show.artist_id, 1), []),
+            'upcoming shows for venue': (Show.query.filter(Show.venue_id == 1, Show.start_time > now), []),
+            'past shows for artist': (Show.query.filter(Show.artist_id == 1, Show.start_time < now), []),
+            'venue listing': (query_venue_areas(), ['Venue']),
+            'artist letter counts': (query_artist_letters(), ['Artist']),
+            'artist letter page': (query_artist_page('A', after='Artist 5').limit(201), []),
+            'shows page': (query_show_page().limit(31), ['Show']),
+            'next shows page': (query_show_page(after=(now, 5), upcoming_only=True).limit(31), []),
+            'venues by genre': (Venue.query.filter(Venue.genres.op('@>')(['Jazz'])), []),
+            'artists by genre': (Artist.query.filter(Artist.genres.op('@>')(['Jazz'])), []),
+            'venue booking conflict': (Show.query.filter(
+                booking_key(Show.venue_id).op('&&')(booking_key(1)),
+                booking_period(Show.start_time, Show.end_time).op('&&')(booking_period(now, now + SHOW_DURATION))
+            ), []),
+            'venues within radius': (query_venues_within(37.77, -122.42, 5), []),
+        }
+        # the partitions of months without shows yet are read whichever way is cheapest
+        empty = set(db.session.execute(text(
+            'SELECT relname FROM pg_class WHERE relispartition AND reltuples <= 0')).scalars())
+        for name, (query, expected) in hot_queries.items():
+            with self.subTest(name):
+                nodes = [node for node in plan_nodes(query) if node.get('Relation Name') not in empty]
+                self.assertEqual(full_scans(nodes), expected)
+                if expected:
+                    self.assertNotIn('Sort', [node['Node Type'] for node in nodes])
+        # the seeded ids moved the sequences along, so new rows still insert
+        venue, artist = Venue(name='Seeded Venue'), Artist(name='Seeded Artist')
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        self.assertEqual((venue.id, artist.id), (3001, 3001))
+        db.session.rollback()
+
+    def test_search_uses_trigram_indexes(self):
+        """Test the SQL search is served by the trigram indexes (EXPLAIN, no full scans)"""
+        if db.session.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is None:
+            self.skipTest('the database server has no pg_trgm')
+        seed_dataset(db, venues=3000, artists=3000, shows=0)
+        db.session.execute(text('ANALYZE'))
+        for model in (Venue, Artist):
+            with self.subTest(model.__name__):
+                nodes = plan_nodes(query_search(model, 'jazz'))
+                self.assertEqual(full_scans(nodes), [])
+                self.assertTrue(set(node.get('Index Name') for node in nodes) >= set(
+                    'ix_{}_{}_trgm'.format(model.__tablename__.lower(), field) for field in ('name', 'city', 'genres')))
+        db.session.rollback()
+
+    def test_api_conditional_get(self):
+        """Test API responses carry ETags that move with the data"""
+        venue_id, artist_id = Venue.query.first().id, self.artist.id
+        for day, path in enumerate(('/api/v1/venues', '/api/v1/venues/{}'.format(venue_id),
+                                    '/api/v1/artists/{}'.format(artist_id))):
+            res = self.client().get(path)
+            self.assertEqual(res.status_code, 200)
+            etag = res.headers['ETag']
+            with QueryCounter(db.engine) as queries:
+                res = self.client().get(path, headers={'If-None-Match': etag})
+            self.assertEqual(res.status_code, 304)
+            self.assertEqual(res.data, b'')
+            self.assertEqual(queries.count, 1)
+
+            self.client().post('/shows/create', data={
+                'venue_id': venue_id,
+                'artist_id': artist_id,
+                'start_time': (self.now + timedelta(days=30 + day)).strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            res = self.client().get(path, headers={'If-None-Match': etag})
+            self.assertEqual(res.status_code, 200)
+            self.assertNotEqual(res.headers['ETag'], etag)
+
+        # the listings are validated from the write count, not the table,
+        # and it moves with writes made outside the ORM too
+        etag = self.client().get('/api/v1/artists').headers['ETag']
+        with QueryCounter(db.engine) as queries:
+            res = self.client().get('/api/v1/artists', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertNotIn('"Artist"', queries.statements[0])
+        db.session.execute(text('UPDATE "Artist" SET image_link = \'x.png\''))
+        db.session.commit()
+        self.assertEqual(self.client().get('/api/v1/artists', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_api_payloads(self):
+        """Test the JSON bodies of the API routes"""
+        venue = Venue.query.first()
+        data = self.client().get('/api/v1/venues/{}'.format(venue.id)).get_json()['data']
+        self.assertEqual(data['name'], venue.name)
+        self.assertEqual(len(data['upcoming_shows']), 2)
+        # datetimes go out as ISO 8601
+        datetime.fromisoformat(data['upcoming_shows'][0]['start_time'])
+
+        self.assertEqual(len(self.client().get('/api/v1/venues').get_json()['data']), 3)
+        self.assertEqual(self.client().get('/api/v1/artists').get_json()['data'][0]['name'], 'Guns N Petals')
+        db.session.add_all([Artist(name='Artist {:02d}'.format(i)) for i in range(5)])
+        db.session.commit()
+        with mock.patch('api.ARTISTS_PER_PAGE', 3):
+            first = self.client().get('/api/v1/artists').get_json()
+            second = self.client().get('/api/v1/artists?letter=A&after=' + first['next']).get_json()
+        self.assertEqual((first['letter'], first['letters']['A'], first['letters']['G']), ('A', 5, 1))
+        self.assertEqual([artist['name'] for artist in first['data'] + second['data']],
+                         ['Artist {:02d}'.format(i) for i in range(5)])
+        self.assertIsNone(second['next'])
+
+        res = self.client().get('/api/v1/venues/0')
+        self.assertEqual((res.status_code, res.get_json()), (404, {'error': 'not found'}))
+
+        res = self.client().get('/api/v1/venues/search?q=austin')
+        self.assertEqual(res.get_json()['count'], 3)
+
+        with mock.patch('api.SHOWS_PER_PAGE', 20):
+            first = self.client().get('/api/v1/shows').get_json()
+            second = self.client().get('/api/v1/shows?after=' + first['next']).get_json()
+        self.assertEqual(len(first['data']) + len(second['data']), 36)
+        self.assertIsNone(second['next'])
+
+    def test_json_dumps_arguments(self):
+        """Test json.dumps() arguments are honoured, by orjson where it can"""
+        data = {'b': datetime(2026, 1, 2, 20, 30), 'a': 'caf\u00e9', 'c': {1.5}}
+        self.assertEqual(json.loads(self.app.json.dumps(data, sort_keys=True, default=sorted)),
+                         {'a': 'caf\u00e9', 'b': '2026-01-02T20:30:00', 'c': [1.5]})
+        self.assertTrue(self.app.json.dumps(data, sort_keys=True, default=sorted).startswith('{"a":"caf\u00e9"'))
+        self.assertEqual(self.app.json.dumps({'a': [1]}, indent=2), '{\n  "a": [\n    1\n  ]\n}')
+        # beyond orjson: escaped non-ASCII, other indents and separators
+        self.assertEqual(self.app.json.dumps({'a': 'caf\u00e9', 'b': 1}, ensure_ascii=True, separators=(', ', ': ')),
+                         '{"a": "caf\\u00e9", "b": 1}')
+        self.assertEqual(self.app.json.dumps(data, indent=4, default=sorted).splitlines()[1],
+                         '    "b":"2026-01-02T20:30:00",')
+        with self.assertRaises(TypeError):
+            self.app.json.dumps(data)
+
+    def test_show_partitions(self):
+        """Test shows are kept in monthly partitions, upcoming queries only
+        read the current ones, and old months move to the archive, where
+        their venue and artist pages still list them
+        """
+        venue = Venue.query.first()
+        venue_id, artist_id = venue.id, self.artist.id
+        old = month_start(self.now, -14) + timedelta(days=3, hours=20)
+        db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=old))
+        db.session.commit()
+        self.assertEqual(list_partitions('Show'), {})
+        version = Venue.query.get(venue_id).version
+
+        this_month, old_month = partition_name('Show', self.now), partition_name('Show', old)
+        created, archived = partition_shows(self.now)
+        self.assertIn(this_month, created)
+        self.assertEqual(archived, [old_month])
+        self.assertEqual(db.session.execute(text('SELECT count(*) FROM "{}"'.format(DEFAULT_PARTITION))).scalar(), 0)
+        self.assertEqual(set(list_partitions('ShowArchive')), {month_start(old)})
+        self.assertEqual(Show.query.count(), 36)
+        self.assertEqual(ShowArchive.query.filter_by(venue_id=venue_id).count(), 1)
+
+        # the archived show is still a past show of its venue
+        db.session.remove()
+        venue = Venue.query.get(venue_id)
+        self.assertEqual((venue.upcoming_shows_count, venue.past_shows_count), (2, 3))
+        self.assertEqual(venue.version, version)
+        past_shows = venue.get_data_dict()['past_shows']
+        self.assertEqual([show['start_time'] for show in past_shows][0], old)
+        self.assertEqual(past_shows[0]['artist_name'], 'Guns N Petals')
+        res = self.client().get('/venues/{}'.format(venue_id))
+        self.assertIn(b'3 Past Shows', res.data)
+        self.assertIn('{:%B}, {}, {}'.format(old, old.day, old.year).encode(), res.data)
+        self.assertEqual(self.client().get('/venues/{}/shows.ics'.format(venue_id)).data.count(b'BEGIN:VEVENT'), 5)
+        recount_shows()
+        self.assertEqual(Venue.query.get(venue_id).past_shows_count, 3)
+        db.session.remove()
+
+        # only this month's partition and the later ones are read
+        read = set(node['Relation Name'] for node in plan_nodes(Show.query.filter(Show.start_time > datetime.now()))
+                   if 'Relation Name' in node)
+        self.assertIn(this_month, read)
+        self.assertEqual(set(name for name in read if name != DEFAULT_PARTITION and name < this_month), set())
+        db.session.rollback()
+
+        # a show booked into an archived month joins it on the next run
+        db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=old + timedelta(days=1)))
+        db.session.commit()
+        self.assertEqual(partition_shows(self.now), ([old_month], [old_month]))
+        self.assertEqual(ShowArchive.query.count(), 2)
+
+        # archived shows go with their venue, and off its artist's counters
+        self.assertEqual(self.client().delete('/venues/{}'.format(venue_id)).status_code, 200)
+        self.assertEqual(ShowArchive.query.count(), 0)
+        artist = Artist.query.get(artist_id)
+        self.assertEqual((artist.upcoming_shows_count, artist.past_shows_count), (16, 16))
+
+    def test_booking_conflicts(self):
+        """Test overlapping shows are rejected for the venue and the artist"""
+        venue_id, other_venue_id = [venue.id for venue in Venue.query.limit(2)]
+        artist_id = self.artist.id
+        db.session.add(Artist(name='Other'))
+        db.session.commit()
+        other_artist_id = Artist.query.filter_by(name='Other').one().id
+        start = self.now + timedelta(days=20)
+        fmt = '%Y-%m-%d %H:%M:%S'
+
+        def create(venue, artist, start_time, end_time=''):
+            res = self.client().post('/shows/create', data={
+                'venue_id': venue, 'artist_id': artist,
+                'start_time': start_time.strftime(fmt),
+                'end_time': end_time and end_time.strftime(fmt),
+            })
+            return res.data.decode()
+
+        self.assertIn('successfully listed', create(venue_id, artist_id, start))
+        # default length is three hours; touching ends do not overlap
+        self.assertIn('The venue is already booked', create(venue_id, other_artist_id, start + timedelta(hours=2)))
+        self.assertIn('The artist is already booked', create(other_venue_id, artist_id, start - timedelta(hours=1),
+                                                             start + timedelta(minutes=1)))
+        self.assertIn('The artist and the venue are already booked',
+                      create(venue_id, artist_id, start + timedelta(hours=1)))
+        self.assertIn('successfully listed', create(venue_id, other_artist_id, start + SHOW_DURATION))
+        self.assertIn('An error occurred', create(other_venue_id, other_artist_id, start, start))
+
+        self.assertEqual(find_booking_conflicts(venue_id, other_artist_id, start, start + timedelta(hours=1)),
+                         {'venue'})
+        # the constraints hold without the check, too
+        db.session.add(Show(venue_id=venue_id, artist_id=other_artist_id, start_time=start))
+        with self.assertRaises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+    def test_booking_calendar(self):
+        """Test the in-memory calendar the importer checks bookings with"""
+        calendar = BookingCalendar()
+        day = datetime(2030, 1, 1)
+        for hour in (20, 10, 14):
+            calendar.book(1, day + timedelta(hours=hour), day + timedelta(hours=hour + 2))
+        self.assertTrue(calendar.is_free(1, day + timedelta(hours=12), day + timedelta(hours=14)))
+        self.assertTrue(calendar.is_free(1, day, day + timedelta(hours=10)))
+        self.assertTrue(calendar.is_free(2, day + timedelta(hours=10), day + timedelta(hours=11)))
+        self.assertFalse(calendar.is_free(1, day + timedelta(hours=11), day + timedelta(hours=12)))
+        self.assertFalse(calendar.is_free(1, day + timedelta(hours=13), day + timedelta(hours=15)))
+        self.assertFalse(calendar.is_free(1, day + timedelta(hours=9), day + timedelta(hours=23)))
+
+    def test_show_exports(self):
+        """Test the streamed iCalendar and CSV show feeds"""
+        venue = Venue.query.first()
+        res = self.client().get('/venues/{}/shows.ics'.format(venue.id))
+        self.assertTrue(res.is_streamed)
+        self.assertEqual(res.mimetype, 'text/calendar')
+        self.assertNotIn('Content-Length', res.headers)
+        body = res.data.decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 4)
+        self.assertIn('SUMMARY:Guns N Petals at {}'.format(venue.name), body)
+
+        body = self.client().get('/artists/{}/shows.ics'.format(self.artist.id)).data.decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 36)
+        self.assertEqual(self.client().get('/venues/0/shows.ics').status_code, 404)
+
+        res = self.client().get('/shows.csv?city=Austin&upcoming=1')
+        self.assertTrue(res.is_streamed)
+        lines = res.data.decode().splitlines()
+        self.assertEqual(lines[0], 'id,start_time,end_time,venue_id,venue_name,artist_id,artist_name')
+        self.assertEqual(len(lines), 7)
+        self.assertTrue(all(',Austin Hall ' in line for line in lines[1:]))
+
+    def test_ics_encoding(self):
+        """Test long iCalendar lines are folded and rows are sent in chunks"""
+        line = ics_line('SUMMARY', 'é' * 100)
+        parts = line[:-2].split('\r\n')
+        self.assertTrue(all(len(part.encode()) <= 75 for part in parts))
+        self.assertEqual(''.join(part[1:] for part in parts[1:]), 'é' * (100 - len(parts[0]) + 8))
+        self.assertEqual(list(chunked(map(str, range(5)), 2)), ['01', '23', '4'])
+
+    def test_replica_routing(self):
+        """Test read-only pages read from the replica, form submissions
+        write to the primary, and the submitter then reads the primary
+        """
+        replica = create_engine(os.environ.get(
+            'TEST_REPLICA_DATABASE_URL',
+            "postgresql://{}:{}@{}/{}".format('postgres', '1234', 'localhost:5432', 'fyyur_test_replica')))
+        try:
+            replica.connect().close()
+        except OperationalError:
+            self.skipTest('no replica database')
+        db.metadata.drop_all(replica)
+        db.metadata.create_all(replica)
+        with replica.begin() as connection:
+            connection.execute(Venue.__table__.insert(), {'name': 'Replica Hall', 'city': 'Austin', 'state': 'TX'})
+        replica_router.engines = [replica]
+        try:
+            client = self.client()
+            self.assertIn(b'Replica Hall', client.get('/venues').data)
+            self.assertNotIn(b'Austin Hall', client.get('/venues').data)
+
+            client.post('/venues/create', data={'name': 'Fresh Hall', 'city': 'Austin', 'state': 'TX'})
+            self.assertEqual(Venue.query.filter_by(name='Fresh Hall').count(), 1)
+            self.assertIn(b'Fresh Hall', client.get('/venues').data)
+            self.assertIn(b'Replica Hall', self.client().get('/venues').data)
+        finally:
+            replica_router.engines = []
+            db.session.remove()
+            db.metadata.drop_all(replica)
+            replica.dispose()
+
+    def test_venues_near(self):
+        """Test venues are placed from the geocode table and found by distance"""
+        versions = dict(db.session.query(Venue.id, Venue.version))
+        result = self.app.test_cli_runner().invoke(args=['geocode-venues'])
+        self.assertIn('9 venues placed', result.output)
+        self.assertEqual(dict(db.session.query(Venue.id, Venue.version)),
+                         {venue_id: version + 1 for venue_id, version in versions.items()})
+        result = self.app.test_cli_runner().invoke(args=['geocode-venues'])
+        self.assertIn('0 venues placed', result.output)
+        nearest = venues_near(37.7749, -122.4194, k=5)
+        self.assertEqual([venue['city'] for venue in nearest], ['San Francisco'] * 3 + ['Austin'] * 2)
+        self.assertAlmostEqual(nearest[3]['distance_km'], 2420, delta=10)
+        self.assertEqual(len(venues_near(37.7749, -122.4194, k=5, radius_km=100)), 3)
+
+        res = self.client().get('/api/v1/venues/near?lat=40.7&lng=-74&k=1')
+        self.assertEqual(res.get_json()['data'][0]['city'], 'New York')
+        self.assertEqual(self.client().get('/api/v1/venues/near?lat=91&lng=0').status_code, 400)
+        self.assertEqual(self.client().get('/api/v1/venues/near?lat=40').status_code, 400)
+
+    def test_bounding_boxes(self):
+        """Test the boxes around a search circle, across the antimeridian and poles"""
+        (west, south, east, north), = bounding_boxes(0, 0, 111.19)
+        for value, expected in ((west, -1), (south, -1), (east, 1), (north, 1)):
+            self.assertAlmostEqual(value, expected, places=2)
+
+        (west, _, east, _), (west2, _, east2, _) = bounding_boxes(0, 179.5, 111.19)
+        self.assertAlmostEqual(west, 178.5, places=2)
+        self.assertEqual((east, west2), (180.0, -180.0))
+        self.assertAlmostEqual(east2, -179.5, places=2)
+
+        (west, south, east, north), = bounding_boxes(89.5, 10, 111.19)
+        self.assertEqual((west, east), (-180.0, 180.0))
+        self.assertEqual(north, 90.0)
+
+    def test_genre_facets(self):
+        """Test genre counts for a filter, the filtered listing and the facet cache"""
+        db.session.add_all([
+            Venue(name='Blue Room', city='Austin', state='TX', genres=['Jazz', 'Blues']),
+            Venue(name='Folk Barn', city='Austin', state='TX', genres=['Folk', 'Blues']),
+        ])
+        db.session.commit()
+        self.assertEqual(cached_genre_facets(Venue, {'genres': (), 'city': None, 'state': None}),
+                         [('Jazz', 10), ('Blues', 2), ('Folk', 1)])
+        filters = {'genres': ('Blues',), 'city': 'Austin', 'state': 'TX'}
+        self.assertEqual(cached_genre_facets(Venue, filters), [('Blues', 2), ('Folk', 1), ('Jazz', 1)])
+        with QueryCounter(db.engine) as queries:
+            cached_genre_facets(Venue, filters)
+        self.assertEqual(queries.count, 0)
+
+        db.session.add(Venue(name='Blues Shack', city='Austin', state='TX', genres=['Blues']))
+        db.session.commit()
+        self.assertEqual(cached_genre_facets(Venue, filters)[0], ('Blues', 3))
+
+        data = self.client().get('/api/v1/venues/genres?genre=Blues&genre=Jazz').get_json()
+        self.assertEqual([venue['name'] for venue in data['data']], ['Blue Room'])
+        self.assertEqual(data['facets'], [{'genre': 'Blues', 'count': 1}, {'genre': 'Jazz', 'count': 1}])
+
+        res = self.client().get('/venues/genres?genre=Blues&city=Austin')
+        self.assertIn(b'Folk Barn', res.data)
+        self.assertNotIn(b'Austin Hall', res.data)
+        self.assertIn(b'href="/venues/genres?genre=Blues&amp;genre=Folk&amp;city=Austin"', res.data)
+
+    def test_artist_letters(self):
+        """Test the A-Z counts and the keyset pages of one letter"""
+        db.session.add_all([Artist(name=name) for name in ('abba', '2Pac', 'Beck', 'Bjork', 'Blur', 'Blur')])
+        db.session.commit()
+        letters = get_artist_letters()
+        self.assertEqual(list(letters)[:2] + list(letters)[-1:], ['A', 'B', '#'])
+        self.assertEqual((letters['A'], letters['B'], letters['G'], letters['Z'], letters['#']), (1, 3, 1, 0, 1))
+
+        page, after = get_artist_page('B', limit=2)
+        self.assertEqual(([artist['name'] for artist in page], after), (['Beck', 'Bjork'], 'Bjork'))
+        page, after = get_artist_page('B', after=after, limit=2)
+        self.assertEqual(([artist['name'] for artist in page], after), (['Blur'], None))
+
+        # without a letter the first one with artists is shown
+        self.assertIn(b'abba', self.client().get('/artists').data)
+        with mock.patch('views.ARTISTS_PER_PAGE', 2):
+            res = self.client().get('/artists?letter=b')
+        self.assertIn(b'Bjork', res.data)
+        self.assertNotIn(b'Blur', res.data)
+        self.assertIn(b'href="/artists?letter=B&amp;after=Bjork"', res.data)
+
+    def test_autocomplete(self):
+        """Test name and city completion follows creates, edits and deletes"""
+        get_autocomplete()
+        with QueryCounter(db.engine) as queries:
+            data = self.client().get('/autocomplete?q=aus').get_json()
+        self.assertEqual(queries.count, 0)
+        self.assertEqual([venue['name'] for venue in data['venues']], ['Austin Hall 0', 'Austin Hall 1', 'Austin Hall 2'])
+        self.assertEqual(data['cities'], [{'city': 'Austin', 'state': 'TX'}])
+        self.assertEqual(self.client().get('/autocomplete?q=PET').get_json()['artists'][0]['name'], 'Guns N Petals')
+        self.assertEqual(len(self.client().get('/autocomplete?q=hall&limit=2').get_json()['venues']), 2)
+
+        self.client().post('/venues/create', data={'name': 'The Musical Hop', 'city': 'Oakland', 'state': 'CA'})
+        venue_id = Venue.query.filter_by(name='The Musical Hop').one().id
+        data = self.client().get('/autocomplete?q=o').get_json()
+        self.assertEqual(data['cities'], [{'city': 'Oakland', 'state': 'CA'}])
+        self.assertEqual(self.client().get('/autocomplete?q=hop').get_json()['venues'][0]['id'], venue_id)
+
+        self.client().post('/venues/{}/edit'.format(venue_id), data={'name': 'The Musical Hop', 'city': 'Berkeley', 'state': 'CA'})
+        self.assertEqual(self.client().get('/autocomplete?q=o').get_json()['cities'], [])
+        self.assertEqual(self.client().delete('/venues/{}'.format(venue_id)).status_code, 200)
+        self.assertEqual(self.client().get('/autocomplete?q=musical').get_json()['venues'], [])
+        self.assertEqual(self.client().get('/autocomplete?q=berk').get_json()['cities'], [])
+
+    def test_prefix_index(self):
+        """Test the sorted prefix array matches word starts and forgets removed labels"""
+        index = PrefixIndex()
+        index.add(1, 'The Musical Hop')
+        index.add(2, 'Hop Hop Hooray')
+        index.add(3, 'Hopper')
+        # the shortest matching tail first
+        self.assertEqual(index.complete('hop'), [(1, 'The Musical Hop'), (2, 'Hop Hop Hooray'), (3, 'Hopper')])
+        self.assertEqual(index.complete('hop', limit=1), [(1, 'The Musical Hop')])
+        index.add(2, 'Jazz Club')
+        index.remove(3)
+        self.assertEqual(index.complete('h'), [(1, 'The Musical Hop')])
+        self.assertEqual(len(index.pairs), 5)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
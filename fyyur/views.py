@@ -0,0 +1,620 @@
+"""The HTML pages, form handlers and feeds of fyyur.
+
+The forms (WTForms) and dateutil are imported by the views that use
+them, so a worker only loads them once such a page is requested.
+"""
+import base64
+from datetime import datetime
+
+from flask import Blueprint, current_app, render_template, request, Response, flash, redirect, url_for, abort, stream_with_context, jsonify
+from markupsafe import Markup
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, get_venue_areas, iter_venue_areas, get_show_page, ShowPageStream, touch_counterparts, delete_entity, get_artist_letters, get_artist_page, ARTIST_LETTERS, get_genre_facets, query_catalog, catalog_generation, query_show_page, query_entity_shows, stream_show_rows, show_period, find_booking_conflicts, lock_bookings, Venue, Artist, Show
+from search import search, autocomplete, index_entity, unindex_entity, AUTOCOMPLETE_LIMIT
+from extensions import fragment_cache, facet_cache, sql_profiler
+from jsonapi import json_response
+from geocode import geocode
+from exports import chunked, csv_lines, ics_lines
+
+bp = Blueprint('pages', __name__)
+
+SHOWS_PER_PAGE = 30
+ARTISTS_PER_PAGE = 200
+# pages are cheap to send in stream mode, so they can be much longer
+STREAMED_SHOWS_PER_PAGE = 1000
+STREAM_BUFFER_SIZE = 50
+
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def render_streamed(template_name, **context):
+  # render_template() that sends the page while generators in the
+  # context are still being consumed, a few template chunks at a time
+  current_app.update_template_context(context)
+  stream = current_app.jinja_env.get_template(template_name).stream(context)
+  stream.enable_buffering(STREAM_BUFFER_SIZE)
+  return Response(stream_with_context(stream))
+
+def render_detail_fragment(kind, entity):
+  # the body of a venue/artist page, cached per entity version
+  key = (kind, entity.id)
+  fragment = fragment_cache.get(key, entity.version)
+  if fragment is None:
+    data = entity.get_data_dict()
+    fragment = Markup(render_template('fragments/show_{}.html'.format(kind), **{kind: data}))
+    # the page changes when its next upcoming show starts
+    expires_at = None
+    if data['upcoming_shows']:
+      expires_at = data['upcoming_shows'][0]['start_time'].timestamp()
+    fragment_cache.set(key, entity.version, fragment, expires_at=expires_at)
+  return fragment
+
+def parse_date(value):
+  return datetime.strptime(value, '%Y-%m-%d')
+
+def encode_show_cursor(key):
+  # opaque token for the (start_time, id) keyset position
+  start_time, show_id = key
+  raw = '{}|{}'.format(start_time.isoformat(), show_id)
+  return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_show_cursor(token):
+  # raises ValueError on a malformed token
+  start_time, show_id = base64.urlsafe_b64decode(token.encode()).decode().split('|')
+  return datetime.fromisoformat(start_time), int(show_id)
+
+def show_page_args():
+  # (after, filters) for get_show_page() from the query string
+  filters = {
+    'date_from': request.args.get('from', type=parse_date),
+    'date_to': request.args.get('to', type=parse_date),
+    'city': request.args.get('city') or None,
+    'upcoming_only': request.args.get('upcoming') == '1',
+  }
+  after = request.args.get('after')
+  if after:
+    try:
+      after = decode_show_cursor(after)
+    except ValueError:
+      abort(400)
+  return after, filters
+
+CATALOG_MODELS = {'venues': Venue, 'artists': Artist}
+BROWSE_LIMIT = 100
+
+def catalog_filters():
+  # genres (any number of ?genre=), city and state from the query string
+  return {
+    'genres': tuple(sorted(set(request.args.getlist('genre')))),
+    'city': request.args.get('city') or None,
+    'state': request.args.get('state') or None,
+  }
+
+def cached_aggregate(model, key, compute):
+  # compute() over model's table, cached under key; any venue/artist
+  # write in this worker moves the generation and so retires every
+  # entry of the table
+  key = (model.__tablename__,) + key
+  generation = catalog_generation[model.__tablename__]
+  value = facet_cache.get(key, generation)
+  if value is None:
+    value = compute()
+    facet_cache.set(key, generation, value)
+  return value
+
+def cached_genre_facets(model, filters):
+  # keyed on the filter signature
+  return cached_aggregate(model, ('genres',) + tuple(sorted(filters.items())),
+                          lambda: get_genre_facets(model, **filters))
+
+def delete_catalog_entry(kind, entity_id):
+  # a venue or artist and its shows, in a few set-based statements;
+  # then everything derived from them is dropped or moves on
+  model, other_kind = (Venue, 'artist') if kind == 'venue' else (Artist, 'venue')
+  try:
+    touched = delete_entity(model, entity_id)
+    if touched is None:
+      db.session.rollback()
+      return jsonify(success=False, error='not found'), 404
+    db.session.commit()
+  except SQLAlchemyError:
+    db.session.rollback()
+    current_app.logger.exception('%s could not be deleted', kind)
+    return jsonify(success=False, error='{} could not be deleted'.format(kind)), 500
+  finally:
+    db.session.close()
+  fragment_cache.invalidate((kind, entity_id))
+  # their versions moved, so these are stale anyway; free the space
+  for other_id in touched:
+    fragment_cache.invalidate((other_kind, other_id))
+  unindex_entity(model, entity_id)
+  return jsonify(success=True)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@bp.route('/')
+def index():
+  return render_template('pages/home.html')
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@bp.route('/venues')
+def venues():
+  if current_app.config['STREAM_TEMPLATES']:
+    return render_streamed('pages/venues.html', areas=iter_venue_areas())
+  data = get_venue_areas()
+  
+  return render_template('pages/venues.html', areas=data);
+
+  
+@bp.route('/venues/search', methods=['POST'])
+def search_venues():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for Hop should return "The Musical Hop".
+  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+  if not request.form.get('search_term', '').strip():
+    # a blank search lists every venue, as it always has
+    return redirect(url_for('.venues'), 303)
+  response = search(Venue, request.form.get('search_term'))
+  
+  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+@bp.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  # TODO: replace with real venue data from the venues table, using venue_id
+  venue = db.session.query(Venue).get(venue_id)
+  if venue:
+    fragment = render_detail_fragment('venue', venue)
+    
+    return render_template('pages/show_venue.html', venue=venue, fragment=fragment)
+  else:
+    return render_template('errors/404.html')
+
+  
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  # on successful db insert, flash success
+  #flash('Venue ' + request.form['name'] + ' was successfully listed!')
+  # getting form data 
+  error = False
+  try:
+    formdata = request.form
+    current_app.logger.debug('creating venue', extra={'form': formdata.to_dict(flat=False)})
+
+    name = formdata.get('name')
+    city = formdata.get('city')
+    state = formdata.get('state')
+    genres = formdata.getlist('genres')
+    address = formdata.get('address')
+    phone = formdata.get('phone')
+    image_link = formdata.get('image_link')
+    facebook_link  = formdata.get('facebook_link')
+    website =formdata.get('website')
+    seeking_talent = formdata.get('seeking_talent')
+    if seeking_talent is None:
+      seeking_talent = False
+    else:
+      seeking_talent = formdata.get('seeking_talent')
+    seeking_description = formdata.get('seeking_description')
+
+    latitude, longitude = geocode(city, state)
+
+    venue = Venue(name=name,city = city,state = state,phone = phone, genres = genres, 
+                 address = address, image_link = image_link, facebook_link = facebook_link,
+                 website = website, seeking_talent = seeking_talent, seeking_description = seeking_description,
+                 latitude = latitude, longitude = longitude )
+    db.session.add(venue)
+    db.session.commit()    
+    index_entity(venue)
+  
+  except :
+    error=True
+    db.session.rollback()
+    current_app.logger.exception('venue could not be created')
+
+  finally:
+    db.session.close()
+  
+  if  error:
+    # display error message
+    flash('An error occurred. Venue ' + name+ ' could not be listed.')
+  else:
+    
+    flash('Venue ' + request.form['name'] + ' was successfully listed!')
+  return render_template('pages/home.html')
+  
+
+@bp.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # TODO: Complete this endpoint for taking a venue_id, and using
+  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  return delete_catalog_entry('venue', venue_id)
+
+#  Artists
+#  ----------------------------------------------------------------
+def artist_page_args():
+  # (letters, letter, after) for get_artist_page() from the query string;
+  # without a letter, the first one that has artists
+  letters = cached_aggregate(Artist, ('letters',), get_artist_letters)
+  letter = request.args.get('letter', '').upper()
+  if letter not in letters:
+    letter = next((letter for letter in ARTIST_LETTERS if letters[letter]), ARTIST_LETTERS[0])
+  return letters, letter, request.args.get('after') or None
+
+@bp.route('/artists')
+def artists():
+  # one letter of the A-Z index at a time, in keyset pages by name
+  letters, letter, after = artist_page_args()
+  data, next_name = get_artist_page(letter, after=after, limit=ARTISTS_PER_PAGE)
+  next_url = url_for('.artists', letter=letter, after=next_name) if next_name else None
+  render = render_streamed if current_app.config['STREAM_TEMPLATES'] else render_template
+  return render('pages/artists.html', artists=data, letters=letters, letter=letter, next_url=next_url)
+
+@bp.route('/artists/search', methods=['POST'])
+def search_artists():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+  # search for "band" should return "The Wild Sax Band".
+  if not request.form.get('search_term', '').strip():
+    return redirect(url_for('.artists'), 303)
+  response = search(Artist, request.form.get('search_term'))
+  
+  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+@bp.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+  # shows the venue page with the given venue_id
+  # TODO: replace with real venue data from the venues table, using venue_id
+  artist = db.session.query(Artist).get(artist_id)
+  if artist:
+    fragment = render_detail_fragment('artist', artist)
+    return render_template('pages/show_artist.html', artist=artist, fragment=fragment)
+  else:
+    return render_template('errors/404.html')
+
+#  Update
+#  ----------------------------------------------------------------
+@bp.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  return delete_catalog_entry('artist', artist_id)
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  from forms import ArtistForm
+  form = ArtistForm()
+  # TODO: populate form with fields from artist with ID <artist_id>
+  artist = Artist.query.get(artist_id)
+  if artist:
+    form.name.data = artist.name
+    form.genres.data = artist.genres
+    form.city.data = artist.city
+    form.state.data = artist.state
+    form.phone.data = artist.phone
+    form.facebook_link.data = artist.facebook_link
+    form.image_link.data = artist.image_link
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+  else:
+    return render_template('errors/404.html')
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  # TODO: take values from the form submitted, and update existing
+  # artist record with ID <artist_id> using the new attributes
+  try:
+    current_app.logger.debug('editing artist', extra={'artist_id': artist_id})
+    error = False
+    artist = db.session.query(Artist).get(artist_id)
+    formdata  = request.form
+    artist.name = formdata.get('name')
+    artist.city = formdata.get('city')
+    artist.state = formdata.get('state')
+    artist.genres = formdata.getlist('genres')
+    artist.address = formdata.get('address')
+    artist.phone = formdata.get('phone')
+    artist.image_link = formdata.get('image_link')
+    artist.facebook_link  = formdata.get('facebook_link')
+    artist.website =formdata.get('website')
+    seeking_venue = formdata.get('seeking_venue')
+    if seeking_venue is None:
+      artist.seeking_venue = False
+    else:
+      artist.seeking_venue = formdata.get('seeking_venue')
+    artist.seeking_description = formdata.get('seeking_description')
+    touch_counterparts(artist)
+    db.session.commit()
+    fragment_cache.invalidate(('artist', artist_id))
+    index_entity(artist)
+  except:
+    error = True
+    db.session.rollback()
+    current_app.logger.exception('artist could not be updated')
+  finally:
+    db.session.close()
+  if error:
+    flash('An error occurred. Artist ' + request.form['name'] + ' could not be updated')
+  else:
+    flash('Artist ' + request.form['name'] + ' was successfully updated!')
+
+  return redirect(url_for('.show_artist', artist_id=artist_id))
+
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  from forms import VenueForm
+  form = VenueForm()
+  venue = db.session.query(Venue).get(venue_id)
+  if venue:
+    form.name.data = venue.name
+    form.genres.data = venue.genres
+    form.city.data = venue.city
+    form.state.data = venue.state
+    form.phone.data = venue.phone
+    form.facebook_link.data = venue.facebook_link
+    form.image_link.data = venue.image_link
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+  else:
+    return render_template('errors/404.html')
+  
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # TODO: take values from the form submitted, and update existing
+  # venue record with ID <venue_id> using the new attributes
+  try:
+    current_app.logger.debug('editing venue', extra={'venue_id': venue_id})
+    error = False
+    venue = db.session.query(Venue).get(venue_id)
+    formdata  = request.form
+    venue.name = formdata.get('name')
+
+    if (venue.city, venue.state) != (formdata.get('city'), formdata.get('state')):
+      venue.latitude, venue.longitude = geocode(formdata.get('city'), formdata.get('state'))
+    venue.city = formdata.get('city')
+    venue.state = formdata.get('state')
+    venue.genres = formdata.getlist('genres')
+    venue.address = formdata.get('address')
+    venue.phone = formdata.get('phone')
+    venue.image_link = formdata.get('image_link')
+    venue.facebook_link  = formdata.get('facebook_link')
+    venue.website =formdata.get('website')
+    seeking_talent = formdata.get('seeking_talent')
+    if seeking_talent is None:
+      venue.seeking_talent = False
+    else:
+      venue.seeking_talent = formdata.get('seeking_talent')
+    venue.seeking_description = formdata.get('seeking_description')
+    touch_counterparts(venue)
+    db.session.commit()
+    fragment_cache.invalidate(('venue', venue_id))
+    index_entity(venue)
+  except:
+    error = True
+    db.session.rollback()
+    current_app.logger.exception('venue could not be updated')
+  finally:
+    db.session.close()
+  if error:
+    flash('An error occurred. Venue ' + request.form['name'] + ' could not be updated')
+  else:
+    flash('Venue ' + request.form['name'] + ' was successfully updated!')
+
+  return redirect(url_for('.show_venue', venue_id=venue_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  error=False
+  try:
+    formdata = request.form
+    current_app.logger.debug('creating artist', extra={'form': formdata.to_dict(flat=False)})
+    name = formdata.get('name')
+    city = formdata.get('city')
+    state = formdata.get('state')
+    genres = formdata.getlist('genres')
+    
+    phone = formdata.get('phone')
+    image_link = formdata.get('image_link')
+    facebook_link  = formdata.get('facebook_link')
+    website =formdata.get('website')
+    seeking_venue = formdata.get('seeking_venue')
+    if seeking_venue is None:
+      seeking_venue = False
+    else:
+      seeking_venue = formdata.get('seeking_venue')
+    seeking_description = formdata.get('seeking_description')
+
+    artist = Artist(name=name,city = city,genres = genres, state = state,phone = phone , 
+                  image_link = image_link, facebook_link = facebook_link,
+                  seeking_description  = seeking_description, seeking_venue = seeking_venue, website = website )
+    db.session.add(artist)
+    db.session.commit()    
+    index_entity(artist)
+  except :
+    db.session.rollback()
+    error=True
+    # flash('An error occurred. Venue ' + name+ ' could not be listed.')
+    current_app.logger.exception('artist could not be created')
+  finally:
+    db.session.close()
+
+  
+  if  error:
+    # TODO: on unsuccessful db insert, flash an error instead.
+    flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+  
+  else:
+    # on successful db insert, flash success
+    flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  
+  return render_template('pages/home.html')
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@bp.route('/shows')
+def shows():
+  # displays list of shows at /shows, one keyset page at a time
+  after, filters = show_page_args()
+
+  def next_url(next_key):
+    if next_key is None:
+      return None
+    args = request.args.to_dict()
+    args['after'] = encode_show_cursor(next_key)
+    return url_for('.shows', **args)
+
+  if current_app.config['STREAM_TEMPLATES']:
+    page = ShowPageStream(after=after, limit=STREAMED_SHOWS_PER_PAGE, **filters)
+    # the template asks for the link after the loop, once the page is consumed
+    return render_streamed('pages/shows.html', shows=page, filters=request.args,
+                           next_url=lambda: next_url(page.next_key))
+  data, next_key = get_show_page(after=after, limit=SHOWS_PER_PAGE, **filters)
+  return render_template('pages/shows.html', shows=data, next_url=next_url(next_key), filters=request.args)
+
+@bp.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  # called to create new shows in the db, upon submitting new show listing form
+  # TODO: insert form data as a new Show record in the db, instead
+  import dateutil.parser
+  conflicts = None
+  try:
+    error=False
+    end_time = request.form.get('end_time')
+    start_time, end_time = show_period(dateutil.parser.parse(request.form['start_time']),
+                                       dateutil.parser.parse(end_time) if end_time else None)
+    new_show = Show(
+      venue_id=int(request.form['venue_id']),
+      artist_id=int(request.form['artist_id']),
+      start_time=start_time,
+      end_time=end_time,
+    )
+    # a concurrent booking of the venue or artist waits for this commit
+    lock_bookings(new_show.venue_id, new_show.artist_id)
+    conflicts = find_booking_conflicts(new_show.venue_id, new_show.artist_id, start_time, end_time)
+    if not conflicts:
+      db.session.add(new_show)
+      db.session.commit()
+      fragment_cache.invalidate(('venue', new_show.venue_id))
+      fragment_cache.invalidate(('artist', new_show.artist_id))
+  except:
+    error = True
+    db.session.rollback()
+    current_app.logger.exception('show could not be created')
+  finally:
+    db.session.close()
+  if conflicts:
+    flash('The {} {} already booked at that time. Show could not be listed.'.format(
+      ' and the '.join(sorted(conflicts)), 'are' if len(conflicts) > 1 else 'is'))
+  elif error:
+    flash('An error occurred. Show could not be listed.')
+  else:
+    flash('Show was successfully listed!')
+  
+  return render_template('pages/home.html')
+
+#  Autocomplete
+#  ----------------------------------------------------------------
+
+@bp.route('/autocomplete')
+def autocomplete_names():
+  # answered from the in-process prefix index, without a query
+  limit = max(1, min(request.args.get('limit', AUTOCOMPLETE_LIMIT, type=int), 50))
+  return json_response(autocomplete(request.args.get('q'), limit))
+
+#  Genres
+#  ----------------------------------------------------------------
+
+@bp.route('/<any(venues, artists):kind>/genres')
+def browse_genres(kind):
+  model = CATALOG_MODELS[kind]
+  filters = catalog_filters()
+
+  def toggle_url(genre):
+    # the current page with ``genre`` added to or removed from the filter
+    genres = set(filters['genres']) ^ {genre}
+    return url_for('.browse_genres', kind=kind, genre=sorted(genres),
+                   city=filters['city'], state=filters['state'])
+
+  return render_template('pages/browse.html', kind=kind, filters=filters,
+                         facets=cached_genre_facets(model, filters),
+                         results=query_catalog(model, **filters).limit(BROWSE_LIMIT).all(),
+                         toggle_url=toggle_url)
+
+#  Exports
+#  ----------------------------------------------------------------
+
+def export_response(lines, mimetype, filename):
+  # no Content-Length, so the feed goes out with chunked transfer as
+  # the cursor is read
+  response = Response(stream_with_context(chunked(lines)), mimetype=mimetype)
+  response.headers['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+  return response
+
+@bp.route('/<any(venues, artists):kind>/<int:entity_id>/shows.ics')
+def export_entity_calendar(kind, entity_id):
+  model, fk = (Venue, Show.venue_id) if kind == 'venues' else (Artist, Show.artist_id)
+  entity = db.session.query(model.name).filter(model.id == entity_id).first()
+  if entity is None:
+    abort(404)
+  rows = stream_show_rows(query_entity_shows(fk, entity_id))
+  return export_response(ics_lines(rows, entity.name, request.host),
+                         'text/calendar', '{}-{}.ics'.format(kind[:-1], entity_id))
+
+@bp.route('/shows.csv')
+def export_shows_csv():
+  # the same filters as /shows, without the page limit
+  after, filters = show_page_args()
+  rows = stream_show_rows(query_show_page(after, **filters))
+  return export_response(csv_lines(rows), 'text/csv', 'shows.csv')
+
+@bp.route('/_debug/requests')
+def debug_requests():
+  # newest first; only served while SQL profiling is switched on
+  if not current_app.config['SQL_PROFILING']:
+    abort(404)
+  return jsonify(requests=sql_profiler.recent()[::-1])